@@ -1,4 +1,16 @@
+import asyncio
+import inspect
+import itertools
+import os
+import pickle
+import queue
+import struct
+import sys
+import threading
+import zlib
 from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import Future
 
 """
 Command Pattern
@@ -14,10 +26,29 @@ Command Pattern
 
 class Command(ABC):
 
+    __slots__ = ()
+
     @abstractmethod
     def execute(self):
         pass
 
+    # Optional merge rules used by CommandOptimizer (Example 5). A command without a target is
+    # treated as having unknown side effects and is never merged, dropped or reordered.
+
+    def target(self):
+        return None
+
+    def is_noop(self):
+        return False
+
+    def supersedes_previous(self):
+        # True if running this command makes earlier commands on the same target irrelevant
+        return False
+
+    def merge(self, later):
+        # Return one command with the effect of self followed by later, or None if not mergeable
+        return None
+
 
 class SimpleCommand(Command):
 
@@ -72,6 +103,551 @@ class Invoker:
             self._on_finish.execute()
 
 
+# Example 2
+# Below example runs a stream of commands on a pool of worker threads. Commands sharing an ordering
+# key always land on the same worker, so they run in submission order while unrelated commands run
+# in parallel. Each worker has a bounded queue, so a fast producer blocks (backpressure) instead of
+# growing memory without limit.
+
+
+class CommandExecutor:
+
+    def __init__(self, workers=4, max_pending=1000):
+        self._queues = [queue.Queue(maxsize=max_pending) for _ in range(workers)]
+        self._locks = [threading.Lock() for _ in range(workers)]
+        self._round_robin = itertools.count()
+        self._shutdown = False
+        self._shutdown_lock = threading.Lock()
+        self._threads = [
+            threading.Thread(target=self._work, args=(work_queue,), daemon=True)
+            for work_queue in self._queues
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, command, key=None, timeout=None):
+        # Blocks while the target worker queue is full. Raises queue.Full if timeout expires.
+        assert isinstance(command, Command)
+        if key is None:
+            index = next(self._round_robin) % len(self._queues)
+        else:
+            index = hash(key) % len(self._queues)
+
+        future = Future()
+        with self._locks[index]:
+            if self._shutdown:
+                raise RuntimeError('Cannot submit command {} after shutdown'.format(command))
+            self._queues[index].put((future, command), timeout=timeout)
+        return future
+
+    def shutdown(self, wait=True):
+        # Queued commands are drained before the workers exit. Only the first call stops the
+        # workers, later calls just wait for them, so no sentinel lands on a queue nobody reads.
+        with self._shutdown_lock:
+            first_call = not self._shutdown
+            self._shutdown = True
+        if first_call:
+            for lock, work_queue in zip(self._locks, self._queues):
+                with lock:
+                    work_queue.put(None)
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown(wait=True)
+
+    @staticmethod
+    def _work(work_queue):
+        while True:
+            work_item = work_queue.get()
+            if work_item is None:
+                return
+
+            future, command = work_item
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                result = command.execute()
+            except BaseException as exc:
+                future.set_exception(exc)
+            else:
+                future.set_result(result)
+
+
+# Example 3
+# Below example records executed commands in an append-only journal so state can be rebuilt after a
+# crash by replaying it. Every record is length prefixed and checksummed. Concurrent writers are
+# batched: the first waiting writer becomes the leader and writes and fsyncs everything queued so
+# far, so many commands share one fsync (group commit).
+
+
+class CommandJournal:
+
+    _header = struct.Struct('>II')  # payload length, crc32 of payload
+
+    def __init__(self, path, compactor=None, compact_every=10000):
+        # compactor receives the replayed commands and returns the commands to keep
+        self.path = path
+        self.compactor = compactor
+        self.compact_every = compact_every
+        self._condition = threading.Condition()
+        self._pending = []
+        self._appended = 0
+        self._synced = 0
+        self._flushing = False
+        self._error = None
+        self._since_compaction = 0
+        self._truncate_torn_tail()
+        self._file = open(path, 'ab')
+
+    def append(self, command):
+        # Returns once the command is durable on disk
+        assert isinstance(command, Command)
+        data = pickle.dumps(command, protocol=pickle.HIGHEST_PROTOCOL)
+        record = self._header.pack(len(data), zlib.crc32(data)) + data
+
+        with self._condition:
+            self._pending.append(record)
+            self._appended += 1
+            sequence = self._appended
+            while self._synced < sequence:
+                if self._error is not None:
+                    raise IOError('Journal {} failed to sync'.format(self.path)) from self._error
+                if self._flushing:
+                    self._condition.wait()
+                    continue
+                self._flush_as_leader()
+        return sequence
+
+    def _flush_as_leader(self):
+        # Called with the condition held. The lock is released while writing so that other
+        # writers can queue up the next batch.
+        self._flushing = True
+        batch, self._pending = self._pending, []
+        target = self._appended
+        self._condition.release()
+        try:
+            self._file.write(b''.join(batch))
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        except OSError as exc:
+            self._error = exc
+        finally:
+            self._condition.acquire()
+            self._flushing = False
+            self._condition.notify_all()
+
+        if self._error is None:
+            self._synced = target
+            self._since_compaction += len(batch)
+            if self.compactor and self._since_compaction >= self.compact_every:
+                self._compact()
+
+    def replay(self):
+        # Sequentially yields journaled commands, stopping at a torn or corrupt tail
+        for _, data in self._records():
+            yield pickle.loads(data)
+
+    def recover(self):
+        count = 0
+        for command in self.replay():
+            command.execute()
+            count += 1
+        return count
+
+    def compact(self):
+        with self._condition:
+            while self._flushing:
+                self._condition.wait()
+            self._compact()
+
+    def close(self):
+        self._file.close()
+
+    def _compact(self):
+        # Called with the condition held and no flush in progress
+        commands = self.compactor(list(self.replay())) if self.compactor else self.replay()
+        temp_path = '{}.compact'.format(self.path)
+        with open(temp_path, 'wb') as temp_file:
+            for command in commands:
+                data = pickle.dumps(command, protocol=pickle.HIGHEST_PROTOCOL)
+                temp_file.write(self._header.pack(len(data), zlib.crc32(data)) + data)
+            temp_file.flush()
+            os.fsync(temp_file.fileno())
+
+        self._file.close()
+        os.replace(temp_path, self.path)
+        self._file = open(self.path, 'ab')
+        self._since_compaction = 0
+
+    def _records(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb', buffering=1 << 20) as journal_file:
+            offset = 0
+            while True:
+                header = journal_file.read(self._header.size)
+                if len(header) < self._header.size:
+                    return
+                length, checksum = self._header.unpack(header)
+                data = journal_file.read(length)
+                if len(data) < length or zlib.crc32(data) != checksum:
+                    return
+                offset += self._header.size + length
+                yield offset, data
+
+    def _truncate_torn_tail(self):
+        # A crash in the middle of a write can leave a partial record behind. Cut it off so new
+        # records are not appended after garbage.
+        valid_end = 0
+        for valid_end, _ in self._records():
+            pass
+        if os.path.exists(self.path) and os.path.getsize(self.path) > valid_end:
+            with open(self.path, 'r+b') as journal_file:
+                journal_file.truncate(valid_end)
+
+
+# Example 4
+# Below example adds undo/redo. Each command stores only the delta it needs to reverse itself (the
+# inserted position and length, or the deleted text) instead of a copy of the document. The history
+# is capped by an estimate of its size in bytes and drops the oldest commands first. Optional
+# checkpoints (document snapshots) let undo_to jump far back without undoing every command one by
+# one.
+
+
+class UndoableCommand(Command):
+
+    __slots__ = ()
+
+    @abstractmethod
+    def undo(self):
+        pass
+
+    def size(self):
+        # Rough number of bytes held by the command, used for the history memory budget
+        values = list(getattr(self, '__dict__', {}).values())
+        for cls in type(self).__mro__:
+            slots = vars(cls).get('__slots__', ())
+            for name in [slots] if isinstance(slots, str) else slots:
+                if name not in ('__dict__', '__weakref__') and hasattr(self, name):
+                    values.append(getattr(self, name))
+        return sys.getsizeof(self) + sum(sys.getsizeof(value) for value in values)
+
+
+class TextDocument:
+
+    def __init__(self, text=''):
+        self.text = text
+
+
+class InsertText(UndoableCommand):
+
+    __slots__ = ('document', 'position', 'text')
+
+    def __init__(self, document, position, text):
+        self.document = document
+        self.position = position
+        self.text = text
+
+    def execute(self):
+        text = self.document.text
+        self.document.text = text[:self.position] + self.text + text[self.position:]
+
+    def undo(self):
+        text = self.document.text
+        self.document.text = text[:self.position] + text[self.position + len(self.text):]
+
+
+class DeleteText(UndoableCommand):
+
+    __slots__ = ('document', 'position', 'length', 'deleted')
+
+    def __init__(self, document, position, length):
+        self.document = document
+        self.position = position
+        self.length = length
+        self.deleted = None
+
+    def execute(self):
+        text = self.document.text
+        self.deleted = text[self.position:self.position + self.length]
+        self.document.text = text[:self.position] + text[self.position + self.length:]
+
+    def undo(self):
+        text = self.document.text
+        self.document.text = text[:self.position] + self.deleted + text[self.position:]
+
+
+class CommandHistory:
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, checkpoint_every=None, snapshot=None,
+                 restore=None):
+        # snapshot() returns a copy of the state and restore(state) puts it back. Both are needed
+        # for checkpoints.
+        assert checkpoint_every is None or (snapshot and restore)
+        self.max_bytes = max_bytes
+        self.checkpoint_every = checkpoint_every
+        self.snapshot = snapshot
+        self.restore = restore
+        self.nbytes = 0
+        self._done = deque()  # (command, size)
+        self._undone = []  # (command, size)
+        self._checkpoints = deque()  # (position, state, size)
+        self._evicted = 0
+
+    @property
+    def position(self):
+        # Number of commands applied since the history started, including evicted ones
+        return self._evicted + len(self._done)
+
+    def execute(self, command):
+        assert isinstance(command, UndoableCommand)
+        command.execute()
+        self._clear_redo()
+        self._push_done(command, command.size())
+
+        if self.checkpoint_every and self.position % self.checkpoint_every == 0:
+            state = self.snapshot()
+            size = sys.getsizeof(state)
+            self._checkpoints.append((self.position, state, size))
+            self.nbytes += size
+        self._evict()
+
+    def undo(self):
+        if not self._done:
+            raise IndexError('Nothing to undo')
+        command, size = self._done.pop()
+        command.undo()
+        self._undone.append((command, size))
+
+    def redo(self):
+        if not self._undone:
+            raise IndexError('Nothing to redo')
+        command, size = self._undone.pop()
+        command.execute()
+        self._done.append((command, size))
+
+    def undo_to(self, position):
+        if not self._evicted <= position <= self.position:
+            raise ValueError('Position {} is outside of history [{}, {}]'.format(
+                position,
+                self._evicted,
+                self.position,
+            ))
+
+        checkpoint = next(
+            (checkpoint for checkpoint in self._checkpoints
+             if position <= checkpoint[0] <= self.position),
+            None,
+        )
+        if checkpoint is not None and checkpoint[0] < self.position:
+            # Skip the commands after the checkpoint without undoing them one by one
+            while self.position > checkpoint[0]:
+                self._undone.append(self._done.pop())
+            self.restore(checkpoint[1])
+
+        while self.position > position:
+            self.undo()
+
+    def _push_done(self, command, size):
+        self._done.append((command, size))
+        self.nbytes += size
+
+    def _clear_redo(self):
+        self.nbytes -= sum(size for _, size in self._undone)
+        self._undone.clear()
+        while self._checkpoints and self._checkpoints[-1][0] > self.position:
+            self.nbytes -= self._checkpoints.pop()[2]
+
+    def _evict(self):
+        while self.nbytes > self.max_bytes and self._done:
+            _, size = self._done.popleft()
+            self.nbytes -= size
+            self._evicted += 1
+            while self._checkpoints and self._checkpoints[0][0] < self._evicted:
+                self.nbytes -= self._checkpoints.popleft()[2]
+
+
+# Example 5
+# Below example optimizes a batch of commands before running it. Command classes declare their
+# own merge rules. The optimizer drops no-ops, drops commands overwritten by a later command on the
+# same target and merges compatible commands on the same target into one.
+
+
+class SetValue(Command):
+
+    def __init__(self, store, key, value):
+        self.store = store
+        self.key = key
+        self.value = value
+
+    def execute(self):
+        self.store[self.key] = self.value
+
+    def target(self):
+        return id(self.store), self.key
+
+    def supersedes_previous(self):
+        return True
+
+    def merge(self, later):
+        if isinstance(later, IncrementValue):
+            return SetValue(self.store, self.key, self.value + later.amount)
+        return None
+
+
+class IncrementValue(Command):
+
+    # Adding 0 leaves the store untouched. A merge of non-zero increments that add up to 0 still
+    # creates a missing key, like running them one by one would, so it keeps create_key set.
+
+    def __init__(self, store, key, amount, create_key=False):
+        self.store = store
+        self.key = key
+        self.amount = amount
+        self.create_key = create_key
+
+    def execute(self):
+        if self.amount or (self.create_key and self.key not in self.store):
+            self.store[self.key] = self.store.get(self.key, 0) + self.amount
+
+    def target(self):
+        return id(self.store), self.key
+
+    def is_noop(self):
+        return self.amount == 0 and not self.create_key
+
+    def merge(self, later):
+        if isinstance(later, IncrementValue):
+            return IncrementValue(
+                self.store,
+                self.key,
+                self.amount + later.amount,
+                create_key=self.create_key or later.create_key or bool(self.amount or later.amount),
+            )
+        return None
+
+
+class CommandOptimizer:
+
+    def optimize(self, commands):
+        return self._merge(self._drop_superseded(commands))
+
+    @staticmethod
+    def _drop_superseded(commands):
+        # Walk backwards remembering targets that a later command overwrites
+        kept = []
+        overwritten = set()
+        for command in reversed(commands):
+            target = command.target()
+            if target is None:
+                overwritten.clear()
+            elif target in overwritten or command.is_noop():
+                continue
+            elif command.supersedes_previous():
+                overwritten.add(target)
+            kept.append(command)
+        kept.reverse()
+        return kept
+
+    @staticmethod
+    def _merge(commands):
+        # Commands in between touch other targets, so merging a command into the previous command
+        # on its target does not change the outcome
+        result = []
+        last_index = {}
+        for command in commands:
+            target = command.target()
+            if target is None:
+                last_index.clear()
+                result.append(command)
+                continue
+
+            index = last_index.get(target)
+            merged = result[index].merge(command) if index is not None else None
+            if merged is None:
+                last_index[target] = len(result)
+                result.append(command)
+            elif merged.is_noop():
+                result[index] = None
+                del last_index[target]
+            else:
+                result[index] = merged
+
+        return [command for command in result if command is not None]
+
+
+# Example 6
+# Below example is an asyncio version of Invoker. Commands may return a coroutine from execute.
+# All commands of a hook group run concurrently on one event loop, each one with its own timeout.
+# If a command fails or times out, the rest of its group is cancelled.
+
+
+class AsyncSimpleCommand(Command):
+
+    def __init__(self, data, delay=0):
+        self.data = data
+        self.delay = delay
+
+    async def execute(self):
+        await asyncio.sleep(self.delay)
+        print("printing data received - {}".format(self.data))
+
+
+class AsyncInvoker:
+
+    def __init__(self, timeout=None):
+        self.timeout = timeout
+        self._on_start = []
+        self._on_finish = []
+
+    def add_on_start(self, command, timeout=None):
+        assert isinstance(command, Command)
+        self._on_start.append((command, timeout))
+
+    def add_on_finish(self, command, timeout=None):
+        assert isinstance(command, Command)
+        self._on_finish.append((command, timeout))
+
+    async def invoke(self):
+        if self._on_start:
+            print('Invoking on start')
+            await self._run_group(self._on_start)
+
+        print('Executing invoke method')
+
+        if self._on_finish:
+            print('Invoking on end')
+            await self._run_group(self._on_finish)
+
+    async def _run_group(self, commands):
+        tasks = [
+            asyncio.ensure_future(self._run(command, timeout))
+            for command, timeout in commands
+        ]
+        try:
+            return await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+    async def _run(self, command, timeout):
+        # Plain commands run inline and only their result is returned
+        result = command.execute()
+        if inspect.isawaitable(result):
+            result = await asyncio.wait_for(
+                result,
+                timeout if timeout is not None else self.timeout,
+            )
+        return result
+
+
 if __name__ == '__main__':
     invoker = Invoker()
     invoker.set_on_start(SimpleCommand('hello'))
@@ -79,6 +655,53 @@ if __name__ == '__main__':
     invoker.set_on_finish(ComplexCommand(handler))
     invoker.invoke()
 
+    with CommandExecutor(workers=4, max_pending=10) as executor:
+        futures = [executor.submit(SimpleCommand(i), key='printer') for i in range(3)]
+    print([future.result() for future in futures])
+
+    journal_path = os.path.join(os.environ.get('TMPDIR', '/tmp'), 'command_journal.log')
+    if os.path.exists(journal_path):
+        os.remove(journal_path)
+    journal = CommandJournal(journal_path)
+    journal.append(SimpleCommand('journaled 1'))
+    journal.append(SimpleCommand('journaled 2'))
+    journal.close()
+    journal = CommandJournal(journal_path)
+    print('Replayed {} commands'.format(journal.recover()))
+    journal.close()
+
+    document = TextDocument()
+    history = CommandHistory(
+        max_bytes=1024 * 1024,
+        checkpoint_every=2,
+        snapshot=lambda: document.text,
+        restore=lambda text: setattr(document, 'text', text),
+    )
+    history.execute(InsertText(document, 0, 'hello'))
+    history.execute(InsertText(document, 5, ' world'))
+    history.execute(DeleteText(document, 0, 6))
+    print(document.text)
+    history.undo()
+    print(document.text)
+    history.redo()
+    history.undo_to(1)
+    print(document.text)
+
+    store = {}
+    commands = [IncrementValue(store, 'hits', 1) for _ in range(1000)]
+    commands += [SetValue(store, 'status', 'busy'), IncrementValue(store, 'hits', 0)]
+    commands += [SetValue(store, 'status', 'idle'), IncrementValue(store, 'status_changes', 2)]
+    optimized = CommandOptimizer().optimize(commands)
+    for command in optimized:
+        command.execute()
+    print('{} commands optimized to {} - {}'.format(len(commands), len(optimized), store))
+
+    async_invoker = AsyncInvoker(timeout=1)
+    async_invoker.add_on_start(AsyncSimpleCommand('slow start', delay=0.2))
+    async_invoker.add_on_start(AsyncSimpleCommand('fast start', delay=0.1))
+    async_invoker.add_on_finish(ComplexCommand(handler))
+    asyncio.run(async_invoker.invoke())
+
 
 """
 Output
@@ -89,4 +712,22 @@ Executing invoke method
 Invoking on end
 Pre executing complex handler
 Post executing complex handler
+printing data received - 0
+printing data received - 1
+printing data received - 2
+[None, None, None]
+printing data received - journaled 1
+printing data received - journaled 2
+Replayed 2 commands
+world
+hello world
+hello
+1004 commands optimized to 3 - {'hits': 1000, 'status': 'idle', 'status_changes': 2}
+Invoking on start
+printing data received - fast start
+printing data received - slow start
+Executing invoke method
+Invoking on end
+Pre executing complex handler
+Post executing complex handler
 """
\ No newline at end of file
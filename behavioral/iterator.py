@@ -1,6 +1,23 @@
-from collections.abc import Iterable, Iterator
+import bisect
+import heapq
+import itertools
+import mmap
+import os
+import pickle
+import struct
+import sys
+import tempfile
+from array import array
+from collections import deque
+from collections.abc import Iterable, Iterator, Sequence
+from concurrent.futures import ProcessPoolExecutor
 from typing import Any
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 """
 Iterator Pattern
 
@@ -17,15 +34,75 @@ class WordsCollection(Iterable):
 
     def __init__(self, _collection) -> None:
         self._collection = _collection
+        # Sorted index kept up to date on every insert so iteration never has to sort
+        self._sorted = sorted(_collection)
 
     def __iter__(self):
-        return AlphabeticalIterator(self._collection, reverse=False)
+        return AlphabeticalIterator(self._sorted, reverse=False)
 
     def get_reverse_iterator(self):
-        return AlphabeticalIterator(self._collection, reverse=True)
+        return AlphabeticalIterator(self._sorted, reverse=True)
 
     def add_item(self, item: Any):
         self._collection.append(item)
+        bisect.insort(self._sorted, item)
+
+    def add_items(self, items: Iterable):
+        # Sort the new items once and merge them in. Timsort merges the two sorted runs in
+        # linear time, which beats inserting items one by one.
+        items = list(items)
+        self._collection.extend(items)
+        self._sorted.extend(sorted(items))
+        self._sorted.sort()
+
+    def iter_range(self, lo=None, hi=None, reverse=False):
+        # Lazily yields words with lo <= word < hi. None means unbounded.
+        start = 0 if lo is None else bisect.bisect_left(self._sorted, lo)
+        stop = len(self._sorted) if hi is None else bisect.bisect_left(self._sorted, hi)
+        return self._iter_slice(start, stop, reverse)
+
+    def iter_prefix(self, prefix, reverse=False):
+        # Words starting with prefix sit between prefix and the first string greater than every
+        # such word, e.g. "ab" -> "ac"
+        upper = prefix.rstrip(chr(0x10FFFF))
+        if upper:
+            upper = upper[:-1] + chr(ord(upper[-1]) + 1)
+        return self.iter_range(prefix, upper or None, reverse=reverse)
+
+    def _iter_slice(self, start, stop, reverse):
+        positions = range(stop - 1, start - 1, -1) if reverse else range(start, stop)
+        for position in positions:
+            yield self._sorted[position]
+
+    def iter_batches(self, size, reverse=False, as_array=False):
+        # Yields lists (or NumPy arrays) of up to size words in alphabetical order
+        if not as_array:
+            return self._batches(size, reverse)
+        if numpy is None:
+            raise ImportError('numpy is required for as_array=True')
+        return (numpy.array(batch) for batch in self._batches(size, reverse))
+
+    def parallel_map(self, fn, workers=None, chunksize=1024):
+        # Applies fn to every word in a process pool and yields results in alphabetical order.
+        # fn must be picklable. Only a few batches are in flight at once, so memory stays bounded.
+        workers = workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            in_flight = deque()
+            max_in_flight = 2 * workers
+            for batch in self._batches(chunksize, reverse=False):
+                in_flight.append(executor.submit(_map_batch, fn, batch))
+                if len(in_flight) >= max_in_flight:
+                    yield from in_flight.popleft().result()
+            while in_flight:
+                yield from in_flight.popleft().result()
+
+    def _batches(self, size, reverse):
+        if reverse:
+            for stop in range(len(self._sorted), 0, -size):
+                yield self._sorted[max(stop - size, 0):stop][::-1]
+        else:
+            for start in range(0, len(self._sorted), size):
+                yield self._sorted[start:start + size]
 
 
 class AlphabeticalIterator(Iterator):
@@ -44,6 +121,10 @@ class AlphabeticalIterator(Iterator):
 
         return value
 
+
+def _map_batch(fn, batch):
+    return [fn(item) for item in batch]
+
 # Example 2
 
 
@@ -59,11 +140,209 @@ count_to_two = lambda: count_to(2)
 count_to_five = lambda: count_to(5)
 
 
+# Example 3
+# Below example keeps a huge sorted vocabulary on disk instead of in the Python heap. The file holds
+# a header, an offset table and the UTF-8 encoded words. It is read through mmap, so opening it
+# only reads the header, words are decoded lazily on access, and every process that opens the file
+# shares the same pages from the OS page cache.
+
+
+class MappedWords(Sequence):
+
+    # File layout: magic, word count, (count + 1) native uint64 offsets, word bytes
+    _magic = b'WORDS001'
+    _header = struct.Struct('=8sQ')
+
+    def __init__(self, path):
+        with open(path, 'rb') as words_file:
+            self._map = mmap.mmap(words_file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self._count = self._header.unpack_from(self._map)
+        if magic != self._magic:
+            raise ValueError('File {} is not a words file'.format(path))
+        table_end = self._header.size + (self._count + 1) * 8
+        self._buffer = memoryview(self._map)
+        self._offsets = self._buffer[self._header.size:table_end].cast('Q')
+        self._data_start = table_end
+
+    @classmethod
+    def write(cls, path, words):
+        words = sorted(words)
+        offsets = array('Q', [0])
+        with open(path, 'wb') as words_file:
+            words_file.write(cls._header.pack(cls._magic, len(words)))
+            words_file.seek(cls._header.size + (len(words) + 1) * 8)
+            for word in words:
+                encoded = word.encode('utf-8')
+                words_file.write(encoded)
+                offsets.append(offsets[-1] + len(encoded))
+            words_file.seek(cls._header.size)
+            offsets.tofile(words_file)
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self[index] for index in range(*position.indices(self._count))]
+        if position < 0:
+            position += self._count
+        if not 0 <= position < self._count:
+            raise IndexError('Word position out of range')
+        start = self._data_start + self._offsets[position]
+        end = self._data_start + self._offsets[position + 1]
+        return str(self._buffer[start:end], 'utf-8')
+
+    def close(self):
+        self._offsets.release()
+        self._buffer.release()
+        self._map.close()
+
+
+class MappedWordsCollection(WordsCollection):
+
+    # Read only. The words file is already sorted, so it doubles as the sorted index.
+
+    def __init__(self, path) -> None:
+        words = MappedWords(path)
+        self._collection = words
+        self._sorted = words
+
+    def add_item(self, item: Any):
+        raise NotImplementedError('Mapped collection is read only')
+
+    def add_items(self, items: Iterable):
+        raise NotImplementedError('Mapped collection is read only')
+
+    def close(self):
+        self._sorted.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+# Example 4
+# Below example iterates in alphabetical order over more words than fit in memory. Words are read
+# in runs that fit the memory budget. Each run is sorted and spilled to a temporary file, and the
+# runs are merged lazily with a heap. ExternalSortIterator takes the same arguments as
+# AlphabeticalIterator, so callers don't need to change when switching collections.
+
+
+class ExternalSortIterator(Iterator):
+
+    _chunk_size = 1024
+
+    def __init__(self, _collection, reverse=False, memory_budget=64 * 1024 * 1024,
+                 disk_budget=None, temp_dir=None):
+        self._collection = _collection
+        self._reverse = reverse
+        self.memory_budget = memory_budget
+        self.disk_budget = disk_budget
+        self.temp_dir = temp_dir
+        self.disk_used = 0
+        self._runs = []
+        self._merged = None
+
+    def __next__(self):
+        if self._merged is None:
+            self._merged = heapq.merge(*self._sorted_runs(), reverse=self._reverse)
+        try:
+            return next(self._merged)
+        except StopIteration:
+            self.close()
+            raise
+
+    def close(self):
+        for run_file in self._runs:
+            run_file.close()
+        self._runs = []
+
+    def _sorted_runs(self):
+        run = []
+        run_bytes = 0
+        for item in self._collection:
+            run.append(item)
+            run_bytes += sys.getsizeof(item) + 8  # item plus its slot in the list
+            if run_bytes >= self.memory_budget:
+                self._spill(run)
+                run = []
+                run_bytes = 0
+
+        if not self._runs:
+            # Everything fit in memory, no need to touch the disk
+            return [iter(sorted(run, reverse=self._reverse))]
+
+        if run:
+            self._spill(run)
+        return [self._read_run(run_file) for run_file in self._runs]
+
+    def _spill(self, run):
+        run.sort(reverse=self._reverse)
+        run_file = tempfile.TemporaryFile(dir=self.temp_dir)
+        self._runs.append(run_file)
+        for start in range(0, len(run), self._chunk_size):
+            pickle.dump(run[start:start + self._chunk_size], run_file, pickle.HIGHEST_PROTOCOL)
+        self.disk_used += run_file.tell()
+        if self.disk_budget is not None and self.disk_used > self.disk_budget:
+            self.close()
+            raise IOError('Temporary files need more than {} bytes'.format(self.disk_budget))
+        run_file.seek(0)
+
+    @staticmethod
+    def _read_run(run_file):
+        while True:
+            try:
+                chunk = pickle.load(run_file)
+            except EOFError:
+                return
+            yield from chunk
+
+
+class ExternalWordsCollection(WordsCollection):
+
+    # Keeps no sorted index. The collection can be any re-iterable source, e.g. an object reading
+    # words from a file.
+
+    def __init__(self, _collection, **sort_options) -> None:
+        self._collection = _collection
+        self.sort_options = sort_options
+
+    def __iter__(self):
+        return ExternalSortIterator(self._collection, reverse=False, **self.sort_options)
+
+    def get_reverse_iterator(self):
+        return ExternalSortIterator(self._collection, reverse=True, **self.sort_options)
+
+    def add_item(self, item: Any):
+        self._collection.append(item)
+
+    def add_items(self, items: Iterable):
+        self._collection.extend(items)
+
+    def _batches(self, size, reverse):
+        words = self.get_reverse_iterator() if reverse else iter(self)
+        while True:
+            batch = list(itertools.islice(words, size))
+            if not batch:
+                return
+            yield batch
+
+    def iter_range(self, lo=None, hi=None, reverse=False):
+        items = (
+            item for item in self._collection
+            if (lo is None or lo <= item) and (hi is None or item < hi)
+        )
+        return ExternalSortIterator(items, reverse=reverse, **self.sort_options)
+
+
 if __name__ == '__main__':
     collection = WordsCollection([])
     collection.add_item("First")
     collection.add_item("Second")
     collection.add_item("Third")
+    collection.add_items(["Fourth", "Fifth"])
 
     print("Straight traversal:")
     print("\n".join(collection))
@@ -71,6 +350,34 @@ if __name__ == '__main__':
 
     print("Reverse traversal:")
     print("\n".join(collection.get_reverse_iterator()))
+    print("")
+
+    print("Prefix traversal:")
+    print("\n".join(collection.iter_prefix("F")))
+    print("")
+
+    print("Reverse range traversal:")
+    print("\n".join(collection.iter_range("Fo", "T", reverse=True)))
+
+    print("")
+
+    words_path = os.path.join(tempfile.gettempdir(), 'words.bin')
+    MappedWords.write(words_path, ["pear", "apple", "fig"])
+    with MappedWordsCollection(words_path) as mapped_collection:
+        print("Mapped traversal:")
+        print("\n".join(mapped_collection))
+        print("")
+
+    external_collection = ExternalWordsCollection(["pear", "apple", "fig"], memory_budget=128)
+    print("External sort reverse traversal:")
+    print("\n".join(external_collection.get_reverse_iterator()))
+    print("")
+
+    print("Batched traversal:")
+    for batch in collection.iter_batches(2):
+        print(batch)
+    print(list(collection.parallel_map(len, workers=2, chunksize=2)))
+    print("")
 
     for number in count_to_five():
         print(number)
@@ -79,12 +386,47 @@ if __name__ == '__main__':
 Output
 
 Straight traversal:
+Fifth
 First
+Fourth
 Second
 Third
 
 Reverse traversal:
 Third
 Second
+Fourth
 First
+Fifth
+
+Prefix traversal:
+Fifth
+First
+Fourth
+
+Reverse range traversal:
+Second
+Fourth
+
+Mapped traversal:
+apple
+fig
+pear
+
+External sort reverse traversal:
+pear
+fig
+apple
+
+Batched traversal:
+['Fifth', 'First']
+['Fourth', 'Second']
+['Third']
+[5, 5, 6, 6, 5]
+
+one
+two
+three
+four
+five
 """
\ No newline at end of file
@@ -1,6 +1,16 @@
 import enum
+import itertools
+import os
+import pickle
+import socket
+import struct
+import tempfile
+import threading
+import time
+import weakref
 from abc import ABC, abstractmethod
-from collections import defaultdict
+from collections import Counter, defaultdict, deque, namedtuple
+from collections.abc import Mapping
 
 """
 Observer Pattern
@@ -29,6 +39,8 @@ class EventType(enum.Enum):
     update = 1
     delete = 2
     retrieve = 4
+    bulk_create = 5
+    bulk_delete = 6
 
 
 class SignalManager(ABC):
@@ -53,9 +65,9 @@ class SignalManager(ABC):
 
 class Signal:
 
-    def __init__(self):
+    def __init__(self, signal_manager=None):
         self.db_record = defaultdict(list)
-        self.signal_manager = SignalManager()
+        self.signal_manager = signal_manager if signal_manager else SignalManager()
 
     def on_create(self, table, data):
         self.db_record[table].append(data)
@@ -72,6 +84,12 @@ class Listener(ABC):
     def notify(self, publisher, *args, **kwargs):
         pass
 
+    def notify_batch(self, publisher, events):
+        # events is a list of (args, kwargs). Override to handle a whole batch in one call, the
+        # default adapts the batch to one notify call per event.
+        for args, kwargs in events:
+            self.notify(publisher, *args, **kwargs)
+
 
 class LoggingListener(Listener):
 
@@ -85,6 +103,622 @@ class EmailAlertListener(Listener):
         print('Alert: Data {} was deleted from table {}'.format(args[0], args[1]))
 
 
+# Example 2
+# Below example delivers events to listeners on background threads so a slow listener doesn't
+# block the publisher. Each listener has its own bounded queue and thread, and an overflow policy
+# that decides what happens when its queue is full.
+
+
+class OverflowPolicy(enum.Enum):
+    block = 0  # publisher waits until the listener catches up
+    drop = 1  # new event is discarded
+    spill = 2  # event is written to a temporary file and read back when the queue has room
+
+
+class ListenerWorker:
+
+    def __init__(self, listener, policy=OverflowPolicy.block, max_pending=1000):
+        self.listener = listener
+        self.policy = policy
+        self.max_pending = max_pending
+        self.delivered = 0
+        self.dropped = 0
+        self.spilled = 0
+        self.errors = 0
+        self.max_lag = 0.0
+        self._events = deque()
+        # Spilled events keep only their time and publisher in memory, the pickled arguments are
+        # in the spill file. Events arriving while anything is spilled are spilled too, so order
+        # is kept.
+        self._spilled = deque()
+        self._spill_file = None
+        self._spill_read = 0
+        self._condition = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def put(self, publisher, args, kwargs):
+        with self._condition:
+            self._check_open()
+            if len(self._events) >= self.max_pending or self._spilled:
+                if self.policy is OverflowPolicy.drop:
+                    self.dropped += 1
+                    return
+                if self.policy is OverflowPolicy.spill:
+                    self._spill(time.monotonic(), publisher, args, kwargs)
+                    return
+                while len(self._events) >= self.max_pending:
+                    self._condition.wait()
+                    self._check_open()
+            self._events.append((time.monotonic(), publisher, args, kwargs))
+            self._condition.notify_all()
+
+    def _check_open(self):
+        if self._closed:
+            raise RuntimeError('Listener worker for {} is closed'.format(self.listener))
+
+    def _spill(self, queued_at, publisher, args, kwargs):
+        if self._spill_file is None:
+            self._spill_file = tempfile.TemporaryFile()
+        self._spill_file.seek(0, os.SEEK_END)
+        pickle.dump((args, kwargs), self._spill_file, pickle.HIGHEST_PROTOCOL)
+        self._spilled.append((queued_at, publisher))
+        self.spilled += 1
+        self._condition.notify_all()
+
+    def _unspill(self):
+        queued_at, publisher = self._spilled.popleft()
+        self._spill_file.seek(self._spill_read)
+        args, kwargs = pickle.load(self._spill_file)
+        self._spill_read = self._spill_file.tell()
+        if not self._spilled:
+            self._spill_file.seek(0)
+            self._spill_file.truncate()
+            self._spill_read = 0
+        return queued_at, publisher, args, kwargs
+
+    def lag(self):
+        # Age in seconds of the oldest event still waiting for the listener. Spilled events are
+        # always newer than queued ones.
+        with self._condition:
+            if self._events:
+                return time.monotonic() - self._events[0][0]
+            if self._spilled:
+                return time.monotonic() - self._spilled[0][0]
+            return 0.0
+
+    def metrics(self):
+        return {
+            'pending': len(self._events) + len(self._spilled),
+            'delivered': self.delivered,
+            'dropped': self.dropped,
+            'spilled': self.spilled,
+            'errors': self.errors,
+            'lag': self.lag(),
+            'max_lag': self.max_lag,
+        }
+
+    def close(self, wait=True):
+        # Pending events are still delivered before the thread exits. Publishers blocked on a
+        # full queue and later put calls get a RuntimeError.
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        if wait:
+            self._thread.join()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._events and not self._spilled and not self._closed:
+                    self._condition.wait()
+                if not self._events and not self._spilled:
+                    if self._spill_file is not None:
+                        self._spill_file.close()
+                    return
+                while self._spilled and len(self._events) < self.max_pending:
+                    self._events.append(self._unspill())
+                queued_at, publisher, args, kwargs = self._events.popleft()
+                self._condition.notify_all()
+
+            self.max_lag = max(self.max_lag, time.monotonic() - queued_at)
+            try:
+                self.listener.notify(publisher, *args, **kwargs)
+            except Exception:
+                self.errors += 1
+            self.delivered += 1
+
+
+class AsyncSignalManager(SignalManager):
+
+    def __init__(self, policy=OverflowPolicy.block, max_pending=1000):
+        super().__init__()
+        self.policy = policy
+        self.max_pending = max_pending
+        self.workers = {}
+
+    def subscribe(self, event_type, listener, policy=None, max_pending=None):
+        # A listener gets one worker for all its event types so it sees events in publish order
+        super().subscribe(event_type, listener)
+        if listener not in self.workers:
+            self.workers[listener] = ListenerWorker(
+                listener,
+                policy if policy else self.policy,
+                max_pending if max_pending else self.max_pending,
+            )
+
+    def un_subscribe(self, event_type, listener):
+        super().un_subscribe(event_type, listener)
+        if not any(listener in listeners for listeners in self.subscribers.values()):
+            self.workers.pop(listener).close()
+
+    def notify(self, publisher, event_type, *args, **kwargs):
+        for subscriber in self.subscribers.get(event_type, []):
+            self.workers[subscriber].put(publisher, args, kwargs)
+
+    def metrics(self):
+        return {listener: worker.metrics() for listener, worker in self.workers.items()}
+
+    def shutdown(self, wait=True):
+        for worker in self.workers.values():
+            worker.close(wait=wait)
+
+
+# Example 3
+# Below example stores records of each table in insertion ordered dicts instead of lists, so a
+# delete is a hash lookup instead of a list scan. Optional secondary indexes map a field value to
+# the rows having it. Bulk operations fire one notification with all records of the call.
+
+
+class RecordTable:
+
+    def __init__(self, key=None, indexes=()):
+        # key(record) must return a hashable identity. Records are their own key by default.
+        self._key = key if key else (lambda record: record)
+        self._next_row = itertools.count()
+        self._records = {}  # row id -> record
+        self._rows_by_key = defaultdict(dict)  # key -> {row id: None}, an ordered set
+        self._indexes = {field: defaultdict(dict) for field in indexes}
+
+    def __iter__(self):
+        return iter(self._records.values())
+
+    def __len__(self):
+        return len(self._records)
+
+    def __contains__(self, record):
+        return bool(self._rows_by_key.get(self._key(record)))
+
+    def insert(self, record):
+        row = next(self._next_row)
+        self._records[row] = record
+        self._rows_by_key[self._key(record)][row] = None
+        for field, index in self._indexes.items():
+            index[self._field(record, field)][row] = None
+
+    def delete(self, record):
+        # Removes the oldest matching record like list.remove
+        key = self._key(record)
+        rows = self._rows_by_key.get(key)
+        if not rows:
+            raise ValueError('Record {} is not in table'.format(record))
+        row = next(iter(rows))
+        del rows[row]
+        if not rows:
+            del self._rows_by_key[key]
+
+        stored = self._records.pop(row)
+        for field, index in self._indexes.items():
+            value = self._field(stored, field)
+            del index[value][row]
+            if not index[value]:
+                del index[value]
+
+    def delete_many(self, records):
+        # Nothing is deleted unless every record is present
+        needed = Counter(self._key(record) for record in records)
+        for record in records:
+            if len(self._rows_by_key.get(self._key(record), ())) < needed[self._key(record)]:
+                raise ValueError('Record {} is not in table'.format(record))
+        for record in records:
+            self.delete(record)
+
+    def find(self, field, value):
+        # Yields records whose field equals value, in insertion order
+        for row in self._indexes[field].get(value, {}):
+            yield self._records[row]
+
+    @staticmethod
+    def _field(record, field):
+        return record[field] if isinstance(record, Mapping) else getattr(record, field)
+
+
+class IndexedSignal(Signal):
+
+    def __init__(self, signal_manager=None, key=None, indexes=()):
+        super().__init__(signal_manager)
+        self.db_record = defaultdict(lambda: RecordTable(key, indexes))
+
+    def on_create(self, table, data):
+        self.db_record[table].insert(data)
+        self.signal_manager.notify(self, EventType.create, table, data)
+
+    def on_delete(self, table, data):
+        self.db_record[table].delete(data)
+        self.signal_manager.notify(self, EventType.delete, table, data)
+
+    def on_create_many(self, table, records):
+        records = list(records)
+        for record in records:
+            self.db_record[table].insert(record)
+        self.signal_manager.notify(self, EventType.bulk_create, table, records)
+
+    def on_delete_many(self, table, records):
+        records = list(records)
+        self.db_record[table].delete_many(records)
+        self.signal_manager.notify(self, EventType.bulk_delete, table, records)
+
+
+# Example 4
+# Below example buffers events per event type and hands them to listeners in batches. A batch is
+# flushed when it holds max_events events or when its oldest event is window_ms old, whichever
+# comes first. Listeners are called without holding the buffer lock, so a slow listener never
+# blocks publishers. Flushed batches are delivered in order by whichever thread is not already
+# delivering, and publishers that flush while another thread delivers return right away.
+
+
+class BatchingSignalManager(SignalManager):
+
+    def __init__(self, max_events=1000, window_ms=50):
+        super().__init__()
+        self.max_events = max_events
+        self.window_ms = window_ms
+        self._buffers = defaultdict(list)  # event type -> [(publisher, args, kwargs)]
+        self._timers = {}
+        self._ready = deque()  # flushed (event type, buffer) waiting to be delivered
+        self._delivering = False
+        self._lock = threading.Lock()
+        self._delivered = threading.Condition(self._lock)
+
+    def notify(self, publisher, event_type, *args, **kwargs):
+        with self._lock:
+            buffer = self._buffers[event_type]
+            buffer.append((publisher, args, kwargs))
+            full = len(buffer) >= self.max_events
+            if not full and event_type not in self._timers:
+                timer = threading.Timer(self.window_ms / 1000, self.flush, args=(event_type,))
+                timer.daemon = True
+                self._timers[event_type] = timer
+                timer.start()
+        if full:
+            self.flush(event_type)
+
+    def flush(self, event_type=None):
+        with self._lock:
+            event_types = [event_type] if event_type is not None else list(self._buffers)
+            for event_type in event_types:
+                timer = self._timers.pop(event_type, None)
+                if timer:
+                    timer.cancel()
+                buffer = self._buffers.pop(event_type, None)
+                if buffer:
+                    self._ready.append((event_type, buffer))
+            if self._delivering:
+                return
+            self._delivering = True
+        self._deliver()
+
+    def close(self):
+        # Also waits for batches another thread is still delivering
+        self.flush()
+        with self._delivered:
+            self._delivered.wait_for(lambda: not self._delivering)
+
+    def _deliver(self):
+        # A failing listener doesn't stop the delivery of the other batches, the first error is
+        # raised once everything is delivered
+        error = None
+        while True:
+            with self._lock:
+                if not self._ready:
+                    self._delivering = False
+                    self._delivered.notify_all()
+                    break
+                event_type, buffer = self._ready.popleft()
+                subscribers = list(self.subscribers.get(event_type, []))
+            # notify_batch takes a single publisher, so split the buffer by publisher
+            for publisher, events in itertools.groupby(buffer, key=lambda event: event[0]):
+                events = [(args, kwargs) for _, args, kwargs in events]
+                for subscriber in subscribers:
+                    try:
+                        subscriber.notify_batch(publisher, events)
+                    except Exception as exception:
+                        error = error or exception
+        if error:
+            raise error
+
+
+class BatchLoggingListener(Listener):
+
+    def notify(self, publisher, *args, **kwargs):
+        self.notify_batch(publisher, [(args, kwargs)])
+
+    def notify_batch(self, publisher, events):
+        print('{} records created: {}'.format(
+            len(events),
+            ', '.join(str(args[1]) for args, _ in events),
+        ))
+
+
+# Example 5
+# Below example subscribes listeners to dotted topics such as "db.table_1.create" instead of a flat
+# EventType. A pattern segment "*" matches one topic segment and "#" matches any number of them.
+# Listeners are held through weak references, so a listener that is garbage collected unsubscribes
+# itself. Matching patterns against a topic happens once per topic: the matching listeners are
+# cached in a dispatch table that is thrown away only when subscriptions change. A listener
+# subscribed to several patterns that match the same topic gets each event once.
+
+
+class TopicSignalManager(SignalManager):
+
+    def __init__(self):
+        super().__init__()
+        self.subscribers = defaultdict(dict)  # pattern -> {id(listener): weak reference}
+        self._dispatch_table = {}  # topic -> tuple of weak references
+
+    def subscribe(self, topic, listener):
+        assert isinstance(listener, Listener)
+        key = id(listener)
+        self.subscribers[self._topic(topic)][key] = weakref.ref(
+            listener,
+            lambda _: self._discard(key),
+        )
+        self._dispatch_table = {}
+
+    def un_subscribe(self, topic, listener):
+        listeners = self.subscribers.get(self._topic(topic), {})
+        if id(listener) in listeners:
+            del listeners[id(listener)]
+            self._dispatch_table = {}
+            return
+        raise ValueError('Listener {} is not subscribed to event - {}'.format(listener, topic))
+
+    def notify(self, publisher, topic, *args, **kwargs):
+        topic = self._topic(topic)
+        listeners = self._dispatch_table.get(topic)
+        if listeners is None:
+            listeners = self._dispatch_table[topic] = self._compile(topic)
+        for reference in listeners:
+            listener = reference()
+            if listener is not None:
+                listener.notify(publisher, *args, **kwargs)
+
+    def _compile(self, topic):
+        # A listener whose patterns overlap still gets each event once
+        segments = topic.split('.')
+        matching = {}
+        for pattern, listeners in self.subscribers.items():
+            if self._matches(pattern.split('.'), segments):
+                for key, reference in listeners.items():
+                    matching.setdefault(key, reference)
+        return tuple(matching.values())
+
+    def _discard(self, key):
+        for pattern, listeners in list(self.subscribers.items()):
+            listeners.pop(key, None)
+            if not listeners:
+                del self.subscribers[pattern]
+        self._dispatch_table = {}
+
+    @classmethod
+    def _matches(cls, pattern, segments):
+        if not pattern:
+            return not segments
+        if pattern[0] == '#':
+            return any(
+                cls._matches(pattern[1:], segments[skip:])
+                for skip in range(len(segments) + 1)
+            )
+        if not segments:
+            return False
+        if pattern[0] not in ('*', segments[0]):
+            return False
+        return cls._matches(pattern[1:], segments[1:])
+
+    @staticmethod
+    def _topic(topic):
+        return topic.name if isinstance(topic, EventType) else topic
+
+
+class TopicSignal(Signal):
+
+    # Publishes to topics like "db.table_1.create"
+
+    def __init__(self, signal_manager=None):
+        super().__init__(signal_manager if signal_manager else TopicSignalManager())
+
+    def on_create(self, table, data):
+        self.db_record[table].append(data)
+        self.signal_manager.notify(self, 'db.{}.create'.format(table), table, data)
+
+    def on_delete(self, table, data):
+        self.db_record[table].remove(data)
+        self.signal_manager.notify(self, 'db.{}.delete'.format(table), table, data)
+
+
+# Example 6
+# Below example forwards events between processes, each with its own SignalManager. Every
+# process connects to an EventBusHub over a Unix socket. Events are pickled in batches and the hub
+# relays each batch unchanged to every other connected process. Each connection is a single
+# ordered stream, so events from one process arrive everywhere in the order they were published.
+
+
+RemotePublisher = namedtuple('RemotePublisher', ['pid'])
+
+_frame_header = struct.Struct('>I')
+
+
+def _recv_exactly(connection, size):
+    data = bytearray()
+    while len(data) < size:
+        chunk = connection.recv(size - len(data))
+        if not chunk:
+            return None
+        data += chunk
+    return bytes(data)
+
+
+def _recv_frame(connection):
+    header = _recv_exactly(connection, _frame_header.size)
+    if header is None:
+        return None
+    return _recv_exactly(connection, _frame_header.unpack(header)[0])
+
+
+class EventBusHub:
+
+    def __init__(self, path):
+        self.path = path
+        self._clients = {}  # connection -> send lock
+        self._lock = threading.Lock()
+        self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._server.bind(path)
+        self._server.listen()
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def close(self):
+        self._server.close()
+        with self._lock:
+            for connection in self._clients:
+                connection.close()
+            self._clients.clear()
+        os.unlink(self.path)
+
+    def _accept(self):
+        while True:
+            try:
+                connection, _ = self._server.accept()
+            except OSError:
+                return
+            # Tell the client it is registered, so it cannot miss events published after
+            # connecting. The ack is sent under the connection's send lock, taken before the
+            # connection becomes visible to relays, so no frame can get in front of it.
+            send_lock = threading.Lock()
+            with send_lock:
+                with self._lock:
+                    self._clients[connection] = send_lock
+                try:
+                    connection.sendall(b'\x01')
+                except OSError:
+                    with self._lock:
+                        self._clients.pop(connection, None)
+                    connection.close()
+                    continue
+            threading.Thread(target=self._relay, args=(connection,), daemon=True).start()
+
+    def _relay(self, source):
+        while True:
+            try:
+                payload = _recv_frame(source)
+            except OSError:
+                payload = None
+            if payload is None:
+                with self._lock:
+                    self._clients.pop(source, None)
+                source.close()
+                return
+
+            frame = _frame_header.pack(len(payload)) + payload
+            with self._lock:
+                targets = [item for item in self._clients.items() if item[0] is not source]
+            for connection, send_lock in targets:
+                try:
+                    with send_lock:
+                        connection.sendall(frame)
+                except OSError:
+                    pass
+
+
+class DistributedSignalManager(SignalManager):
+
+    # Local listeners are notified right away. Remote processes receive events once a batch of
+    # batch_size events is full, window_ms after the first event of the batch, or when flush() is
+    # called. Event arguments must be picklable, and remote listeners get a RemotePublisher
+    # instead of the publisher object. Remote events are delivered to local listeners on the
+    # receiver thread, so listeners may be called by it and by publishing threads at the same
+    # time.
+
+    def __init__(self, path, batch_size=100, window_ms=50):
+        super().__init__()
+        self.batch_size = batch_size
+        self.window_ms = window_ms
+        self.received = 0
+        self._pending = []
+        self._timer = None
+        self._send_lock = threading.Lock()
+        self._received_condition = threading.Condition()
+        self._connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._connection.connect(path)
+        if _recv_exactly(self._connection, 1) is None:
+            raise ConnectionError('Event bus hub at {} closed the connection'.format(path))
+        self._receiver = threading.Thread(target=self._receive, daemon=True)
+        self._receiver.start()
+
+    def notify(self, publisher, event_type, *args, **kwargs):
+        super().notify(publisher, event_type, *args, **kwargs)
+        with self._send_lock:
+            self._pending.append((event_type, args, kwargs))
+            if len(self._pending) >= self.batch_size:
+                self._send()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.window_ms / 1000, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        with self._send_lock:
+            self._send()
+
+    def wait_for_events(self, count, timeout=None):
+        # Waits until count remote events have been delivered to local listeners
+        with self._received_condition:
+            return self._received_condition.wait_for(lambda: self.received >= count, timeout)
+
+    def close(self):
+        self.flush()
+        self._connection.shutdown(socket.SHUT_RDWR)
+        self._connection.close()
+        self._receiver.join()
+
+    def _send(self):
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        payload = pickle.dumps((os.getpid(), self._pending), pickle.HIGHEST_PROTOCOL)
+        self._connection.sendall(_frame_header.pack(len(payload)) + payload)
+        self._pending = []
+
+    def _receive(self):
+        while True:
+            try:
+                payload = _recv_frame(self._connection)
+            except OSError:
+                return
+            if payload is None:
+                return
+
+            pid, events = pickle.loads(payload)
+            publisher = RemotePublisher(pid)
+            for event_type, args, kwargs in events:
+                super().notify(publisher, event_type, *args, **kwargs)
+            with self._received_condition:
+                self.received += len(events)
+                self._received_condition.notify_all()
+
+
 if __name__ == '__main__':
     signal = Signal()
     logging_listener = LoggingListener()
@@ -95,10 +729,67 @@ if __name__ == '__main__':
     signal.on_create(table='table_1', data='bye')
     signal.on_delete(table='table_1', data='bye')
 
+    async_signal = Signal(AsyncSignalManager(policy=OverflowPolicy.drop, max_pending=100))
+    async_signal.signal_manager.subscribe(EventType.create, logging_listener)
+    async_signal.on_create(table='table_2', data='async hello')
+    async_signal.signal_manager.shutdown()
+    print('Delivered {delivered} events, dropped {dropped}'.format(
+        **async_signal.signal_manager.metrics()[logging_listener]
+    ))
+
+    indexed_signal = IndexedSignal(key=lambda user: user['id'], indexes=('city',))
+    indexed_signal.signal_manager.subscribe(EventType.bulk_delete, email_listener)
+    indexed_signal.on_create_many('users', [
+        {'id': 1, 'city': 'Delhi'},
+        {'id': 2, 'city': 'Pune'},
+        {'id': 3, 'city': 'Delhi'},
+    ])
+    indexed_signal.on_delete_many('users', [{'id': 1, 'city': 'Delhi'}])
+    print(list(indexed_signal.db_record['users'].find('city', 'Delhi')))
+
+    batching_signal = Signal(BatchingSignalManager(max_events=2, window_ms=1000))
+    batching_signal.signal_manager.subscribe(EventType.create, BatchLoggingListener())
+    batching_signal.signal_manager.subscribe(EventType.create, logging_listener)
+    for data in ['one', 'two', 'three']:
+        batching_signal.on_create(table='table_3', data=data)
+    batching_signal.signal_manager.close()
+
+    topic_signal = TopicSignal()
+    topic_signal.signal_manager.subscribe('db.table_4.*', logging_listener)
+    topic_signal.signal_manager.subscribe('db.#.delete', email_listener)
+    topic_signal.on_create(table='table_4', data='topic hello')
+    topic_signal.on_create(table='table_5', data='not logged')
+    topic_signal.on_delete(table='table_5', data='not logged')
+
+    # Both managers live in this process for the example, but each could be in its own process
+    hub_path = os.path.join('/tmp', 'signal-bus-{}.sock'.format(os.getpid()))
+    hub = EventBusHub(hub_path)
+    worker_a = DistributedSignalManager(hub_path)
+    worker_b = DistributedSignalManager(hub_path)
+    worker_b.subscribe(EventType.create, logging_listener)
+    Signal(worker_a).on_create(table='table_6', data='remote hello')
+    worker_a.flush()
+    worker_b.wait_for_events(1, timeout=5)
+    worker_a.close()
+    worker_b.close()
+    hub.close()
+
 """
 Output
 
 Data table_1 is created in table hello. You can do something here
 Data table_1 is created in table bye. You can do something here
 Alert: Data table_1 was deleted from table bye
+Data table_2 is created in table async hello. You can do something here
+Delivered 1 events, dropped 0
+Alert: Data users was deleted from table [{'id': 1, 'city': 'Delhi'}]
+[{'id': 3, 'city': 'Delhi'}]
+2 records created: one, two
+Data table_3 is created in table one. You can do something here
+Data table_3 is created in table two. You can do something here
+1 records created: three
+Data table_3 is created in table three. You can do something here
+Data table_4 is created in table topic hello. You can do something here
+Alert: Data table_5 was deleted from table not logged
+Data table_6 is created in table remote hello. You can do something here
 """
\ No newline at end of file
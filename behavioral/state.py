@@ -1,5 +1,13 @@
+import enum
+import threading
+import time
 from abc import ABC, abstractmethod
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 """
 State Pattern
 
@@ -140,12 +148,412 @@ class VendingMachine:
         self.state = state
 
 
+# Example 2
+# Below example describes the same vending machine as data: a list of transitions (state, event,
+# guard, action, next state) compiled once into a lookup table. States are slotted singletons, so
+# a transition allocates nothing, and an event the current state doesn't accept returns a result
+# code instead of raising.
+
+
+class Result(enum.IntEnum):
+    ok = 0
+    rejected = 1  # the current state has no transition for the event
+    guard_failed = 2  # a transition exists but its guard refused it
+
+
+class FSMState:
+
+    __slots__ = ('name',)
+    _instances = {}
+
+    def __new__(cls, name):
+        state = cls._instances.get(name)
+        if state is None:
+            state = super().__new__(cls)
+            state.name = name
+            cls._instances[name] = state
+        return state
+
+    def __repr__(self):
+        return 'FSMState({!r})'.format(self.name)
+
+
+class StateMachine:
+
+    def __init__(self, transitions):
+        # transitions are (source, event, target, guard, action) tuples. guard(context, *args)
+        # returns a bool and action(context, *args) runs before entering target. Both may be None.
+        # Several transitions for the same source and event are tried in order.
+        self._table = {}
+        for source, event, target, guard, action in transitions:
+            self._table.setdefault((source, event), []).append((guard, action, target))
+        self._table = {key: tuple(rows) for key, rows in self._table.items()}
+
+    def fire(self, context, event, *args):
+        rows = self._table.get((context.state, event))
+        if rows is None:
+            return Result.rejected
+        for guard, action, target in rows:
+            if guard is None or guard(context, *args):
+                if action is not None:
+                    action(context, *args)
+                context.state = target
+                return Result.ok
+        return Result.guard_failed
+
+
+READY = FSMState('ready')
+DISPENSING = FSMState('dispensing')
+
+
+def _price_matches(vending_machine, cash, item_id):
+    item = vending_machine.items.get(item_id)
+    return item is not None and item.price == cash
+
+
+def _is_paid_item(vending_machine, item_id):
+    return item_id == vending_machine.paid_item_id and item_id in vending_machine.items
+
+
+def _take_cash(vending_machine, cash, item_id):
+    vending_machine.collected_cash += cash
+    vending_machine.paid_item_id = item_id
+
+
+def _refund_cash(vending_machine, item_id):
+    vending_machine.collected_cash -= vending_machine.items[item_id].price
+    vending_machine.paid_item_id = None
+
+
+def _hand_over_item(vending_machine, item_id):
+    del vending_machine.items[item_id]
+    vending_machine.paid_item_id = None
+
+
+class TableVendingMachine:
+
+    # Unlike DispenseItem, dispensing returns the machine to READY so it can sell again. Only the
+    # item that was paid for can be dispensed or cancelled.
+
+    __slots__ = ('collected_cash', 'items', 'state', 'paid_item_id')
+
+    fsm = StateMachine([
+        (READY, 'collect_cash', DISPENSING, _price_matches, _take_cash),
+        (DISPENSING, 'cancel_transaction', READY, _is_paid_item, _refund_cash),
+        (DISPENSING, 'dispense_item', READY, _is_paid_item, _hand_over_item),
+    ])
+
+    def __init__(self, state=READY):
+        self.collected_cash = 0
+        self.items = {}
+        self.state = state
+        self.paid_item_id = None
+
+    def add_item(self, item_id, name, price):
+        self.items[item_id] = Item(name, price)
+
+    def collect_cash(self, cash, item_id):
+        return self.fsm.fire(self, 'collect_cash', cash, item_id)
+
+    def dispense_item(self, item_id):
+        return self.fsm.fire(self, 'dispense_item', item_id)
+
+    def cancel_transaction(self, item_id):
+        return self.fsm.fire(self, 'cancel_transaction', item_id)
+
+
+# Example 3
+# Below example lets many buyers use one machine at the same time. Each buyer gets a session with
+# its own state and lock, and every inventory slot has its own lock and keeps the cash paid for its
+# item, so buyers of different items never wait on each other. Stock is reserved with an atomic
+# check-and-decrement when cash is collected, so a paid item can always be dispensed.
+
+
+class InventorySlot:
+
+    def __init__(self, item, stock):
+        self.item = item
+        self.stock = stock
+        self.cash = 0
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        with self._lock:
+            if self.stock <= 0:
+                return False
+            self.stock -= 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self.stock += 1
+
+    def add_cash(self, cash):
+        with self._lock:
+            self.cash += cash
+
+
+class ConcurrentVendingMachine:
+
+    def __init__(self):
+        self.slots = {}
+
+    @property
+    def collected_cash(self):
+        # Summed on read, so it is only exact once no purchase is in flight
+        return sum(slot.cash for slot in self.slots.values())
+
+    def add_item(self, item_id, name, price, stock=1):
+        self.slots[item_id] = InventorySlot(Item(name, price), stock)
+
+    def start_session(self):
+        return VendingSession(self)
+
+
+def _reserve_paid_item(session, cash, item_id):
+    # Guard with a side effect: the stock is taken here so the check and the decrement are atomic
+    slot = session.machine.slots.get(item_id)
+    if slot is None or slot.item.price != cash or not slot.reserve():
+        return False
+    session.item_id = item_id
+    return True
+
+
+def _session_take_cash(session, cash, item_id):
+    session.machine.slots[item_id].add_cash(cash)
+
+
+def _is_reserved(session, item_id):
+    return session.item_id == item_id
+
+
+def _session_refund(session, item_id):
+    slot = session.machine.slots[item_id]
+    slot.add_cash(-slot.item.price)
+    slot.release()
+    session.item_id = None
+
+
+def _session_hand_over(session, item_id):
+    session.item_id = None
+
+
+class VendingSession:
+
+    __slots__ = ('machine', 'state', 'item_id', '_lock')
+
+    fsm = StateMachine([
+        (READY, 'collect_cash', DISPENSING, _reserve_paid_item, _session_take_cash),
+        (DISPENSING, 'cancel_transaction', READY, _is_reserved, _session_refund),
+        (DISPENSING, 'dispense_item', READY, _is_reserved, _session_hand_over),
+    ])
+
+    def __init__(self, machine):
+        self.machine = machine
+        self.state = READY
+        self.item_id = None
+        self._lock = threading.Lock()
+
+    def collect_cash(self, cash, item_id):
+        with self._lock:
+            return self.fsm.fire(self, 'collect_cash', cash, item_id)
+
+    def dispense_item(self, item_id):
+        with self._lock:
+            return self.fsm.fire(self, 'dispense_item', item_id)
+
+    def cancel_transaction(self, item_id):
+        with self._lock:
+            return self.fsm.fire(self, 'cancel_transaction', item_id)
+
+
+def stress_test(threads, purchases_per_thread, items=8, stock=10 ** 6):
+    # Buyers on several threads buy random items. Returns (items sold, purchases per second).
+    machine = ConcurrentVendingMachine()
+    for item_id in range(items):
+        machine.add_item(item_id, 'Item {}'.format(item_id), 10, stock)
+    sold = [0] * threads
+
+    def buyer(index):
+        session = machine.start_session()
+        for purchase in range(purchases_per_thread):
+            item_id = (index + purchase) % items
+            if session.collect_cash(10, item_id) is Result.ok:
+                if purchase % 10 == 0:
+                    session.cancel_transaction(item_id)
+                else:
+                    session.dispense_item(item_id)
+                    sold[index] += 1
+
+    workers = [threading.Thread(target=buyer, args=(index,)) for index in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+
+    total_sold = sum(sold)
+    remaining = sum(slot.stock for slot in machine.slots.values())
+    assert remaining == items * stock - total_sold
+    assert machine.collected_cash == total_sold * 10
+    return total_sold, threads * purchases_per_thread / elapsed
+
+
+# Example 4
+# Below example simulates a whole fleet of TableVendingMachine machines with NumPy arrays instead of
+# one object per machine. Every slot holds a stock count (an object machine has stock 1 or 0). A
+# batch of events is split into rounds in which every machine gets at most one event, and each round
+# applies the transition table to all its machines at once. Events of one machine keep their order,
+# so results match feeding the same events to the machine objects one by one.
+
+
+class FleetEvent(enum.IntEnum):
+    collect_cash = 0
+    dispense_item = 1
+    cancel_transaction = 2
+
+
+class VendingFleet:
+
+    state_codes = {READY: 0, DISPENSING: 1}
+
+    def __init__(self, machines, slots):
+        if numpy is None:
+            raise ImportError('numpy is required for VendingFleet')
+        self.state = numpy.zeros(machines, dtype=numpy.int8)
+        self.cash = numpy.zeros(machines, dtype=numpy.int64)
+        self.stock = numpy.zeros((machines, slots), dtype=numpy.int64)
+        self.price = numpy.zeros((machines, slots), dtype=numpy.int64)
+        # Item paid for by a machine in DISPENSING, -1 otherwise
+        self.paid_item = numpy.full(machines, -1, dtype=numpy.int64)
+
+    @classmethod
+    def from_machines(cls, machines, slots):
+        # Item ids of the machines must be integers in range(slots)
+        fleet = cls(len(machines), slots)
+        for index, machine in enumerate(machines):
+            fleet.state[index] = cls.state_codes[machine.state]
+            fleet.cash[index] = machine.collected_cash
+            if machine.paid_item_id is not None:
+                fleet.paid_item[index] = machine.paid_item_id
+            for item_id, item in machine.items.items():
+                fleet.stock[index, item_id] = 1
+                fleet.price[index, item_id] = item.price
+        return fleet
+
+    def apply(self, machine_ids, events, item_ids, cash):
+        # Applies a batch of events and returns a Result code for each of them
+        machine_ids = numpy.asarray(machine_ids, dtype=numpy.int64)
+        events = numpy.asarray(events, dtype=numpy.int8)
+        item_ids = numpy.asarray(item_ids, dtype=numpy.int64)
+        cash = numpy.asarray(cash, dtype=numpy.int64)
+        # Checked before anything is applied, an unknown machine id is a caller bug
+        unknown = (machine_ids < 0) | (machine_ids >= len(self.state))
+        if unknown.any():
+            raise IndexError('Unknown machine id {}'.format(machine_ids[unknown][0]))
+        results = numpy.empty(len(events), dtype=numpy.int8)
+
+        for batch in self._rounds(machine_ids):
+            results[batch] = self._apply_round(
+                machine_ids[batch], events[batch], item_ids[batch], cash[batch],
+            )
+        return results
+
+    @staticmethod
+    def _rounds(machine_ids):
+        # Round r holds the r-th event of every machine that has at least r + 1 events
+        count = len(machine_ids)
+        if not count:
+            return []
+        order = numpy.argsort(machine_ids, kind='stable')
+        sorted_ids = machine_ids[order]
+        group_start = numpy.flatnonzero(numpy.r_[True, sorted_ids[1:] != sorted_ids[:-1]])
+        group_sizes = numpy.diff(numpy.r_[group_start, count])
+        rank = numpy.arange(count) - numpy.repeat(group_start, group_sizes)
+
+        by_round = order[numpy.argsort(rank, kind='stable')]
+        round_sizes = numpy.bincount(rank)
+        return numpy.split(by_round, numpy.cumsum(round_sizes)[:-1])
+
+    def _apply_round(self, machines, events, item_ids, cash):
+        # Unknown item ids fail the guards, they are clipped so indexing cannot fail or wrap around
+        known_item = (item_ids >= 0) & (item_ids < self.stock.shape[1])
+        item_ids = numpy.where(known_item, item_ids, 0)
+
+        ready = self.state[machines] == self.state_codes[READY]
+        in_stock = known_item & (self.stock[machines, item_ids] > 0)
+        paid_for = in_stock & (self.paid_item[machines] == item_ids)
+        price = self.price[machines, item_ids]
+
+        collect = events == FleetEvent.collect_cash
+        dispense = events == FleetEvent.dispense_item
+        cancel = events == FleetEvent.cancel_transaction
+
+        accepted = (collect & ready) | ((dispense | cancel) & ~ready)
+        collected = collect & accepted & in_stock & (price == cash)
+        dispensed = dispense & accepted & paid_for
+        cancelled = cancel & accepted & paid_for
+
+        # Every machine appears at most once per round, so fancy-index updates don't collide
+        self.cash[machines[collected]] += cash[collected]
+        self.cash[machines[cancelled]] -= price[cancelled]
+        self.stock[machines[dispensed], item_ids[dispensed]] -= 1
+        self.state[machines[collected]] = self.state_codes[DISPENSING]
+        self.state[machines[dispensed | cancelled]] = self.state_codes[READY]
+        self.paid_item[machines[collected]] = item_ids[collected]
+        self.paid_item[machines[dispensed | cancelled]] = -1
+
+        results = numpy.full(len(events), Result.guard_failed, dtype=numpy.int8)
+        results[~accepted] = Result.rejected
+        results[collected | dispensed | cancelled] = Result.ok
+        return results
+
+
 if __name__ == '__main__':
     vending_machine = VendingMachine()
     vending_machine.add_item(1, 'Chips', 20)
     vending_machine.add_item(2, 'Chocolate', 30)
     item_id = 1
 
+    table_machine = TableVendingMachine()
+    table_machine.add_item(1, 'Chips', 20)
+    print(table_machine.collect_cash(20, item_id).name)
+    print(table_machine.cancel_transaction(item_id).name)
+    print(table_machine.dispense_item(item_id).name)
+    print(table_machine.collect_cash(10, item_id).name)
+
+    for threads in (1, 2, 4, 8):
+        # The rate depends on the machine, so the output below shows it as <rate>
+        total_sold, throughput = stress_test(threads, purchases_per_thread=1000)
+        print('{} threads sold {} items, {:.0f} purchases/s'.format(
+            threads, total_sold, throughput))
+
+    if numpy is not None:
+        machines = [TableVendingMachine() for _ in range(3)]
+        for machine in machines:
+            machine.add_item(0, 'Chips', 20)
+            machine.add_item(1, 'Chocolate', 30)
+        fleet = VendingFleet.from_machines(machines, slots=2)
+        batch = [
+            (0, FleetEvent.collect_cash, 0, 20),
+            (1, FleetEvent.collect_cash, 1, 30),
+            (0, FleetEvent.dispense_item, 0, 0),
+            (2, FleetEvent.dispense_item, 1, 0),
+            (1, FleetEvent.cancel_transaction, 1, 0),
+            (0, FleetEvent.collect_cash, 0, 20),
+        ]
+        fleet_results = fleet.apply(*zip(*batch))
+        object_results = []
+        for machine_id, event, event_item_id, cash in batch:
+            if event == FleetEvent.collect_cash:
+                arguments = (cash, event_item_id)
+            else:
+                arguments = (event_item_id,)
+            object_results.append(getattr(machines[machine_id], event.name)(*arguments))
+        print([Result(result).name for result in fleet_results])
+        print(list(fleet_results) == object_results, fleet.cash.tolist())
+
     vending_machine.collect_cash(20, item_id)
     vending_machine.cancel_transaction(item_id)
     vending_machine.dispense_item(item_id)
@@ -156,6 +564,16 @@ if __name__ == '__main__':
 """
 Output
 
+ok
+ok
+rejected
+guard_failed
+1 threads sold 900 items, <rate> purchases/s
+2 threads sold 1800 items, <rate> purchases/s
+4 threads sold 3600 items, <rate> purchases/s
+8 threads sold 7200 items, <rate> purchases/s
+['ok', 'ok', 'ok', 'rejected', 'ok', 'guard_failed']
+True [20, 0, 0]
 The cash given 20$ matches item Chips price 20$. Proceeding further
 Transaction for item - 1 is successfully cancelled
 NotImplementedError: Cannot dispense item before receiving cash
@@ -1,4 +1,17 @@
+import heapq
+import math
+import os
+import random
+import time
 from abc import ABC, abstractmethod
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 """
 Strategy Pattern
@@ -30,27 +43,133 @@ the algorithm.
 
 class SortStrategy(ABC):
 
+    # Kind passed to numpy.sort for numeric arrays
+    numpy_kind = 'stable'
+    # Whether sort_list keeps equal items in their original order
+    stable = True
+    # Whether callers need equal items kept in their original order
+    require_stable = True
+
+    def sort(self, items, key=None, reverse=False):
+        # Returns a new sorted list, or a sorted array when given a NumPy array and no key
+        if numpy is not None and isinstance(items, numpy.ndarray) and key is None:
+            result = numpy.sort(items, kind=self.numpy_kind)
+            return result[::-1] if reverse else result
+
+        items = list(items)
+        if key is None and not reverse and (self.stable or not self.require_stable):
+            return self.sort_list(items)
+
+        # Decorate with the original position so ties never compare items and the result is
+        # stable. Negative positions keep ties in original order once the result is reversed.
+        decorated = [
+            (key(item) if key else item, -position if reverse else position, item)
+            for position, item in enumerate(items)
+        ]
+        result = [item for _, _, item in self.sort_list(decorated)]
+        if reverse:
+            result.reverse()
+        return result
+
     @abstractmethod
-    def sort(self, items):
+    def sort_list(self, items):
+        # Returns items, a list, sorted in ascending natural order
         pass
 
 
 class MergeSort(SortStrategy):
 
-    def sort(self, items):
-        print('Sorting items using merge sort')
+    def sort_list(self, items):
+        # Bottom-up merge sort, merging runs of width 1, 2, 4...
+        width = 1
+        count = len(items)
+        while width < count:
+            merged = []
+            for start in range(0, count, 2 * width):
+                left = items[start:start + width]
+                right = items[start + width:start + 2 * width]
+                i = j = 0
+                while i < len(left) and j < len(right):
+                    if right[j] < left[i]:
+                        merged.append(right[j])
+                        j += 1
+                    else:
+                        merged.append(left[i])
+                        i += 1
+                merged.extend(left[i:])
+                merged.extend(right[j:])
+            items = merged
+            width *= 2
+        return items
 
 
 class QuickSort(SortStrategy):
 
-    def sort(self, items):
-        print('Sorting items using quick sort')
+    numpy_kind = 'quicksort'
+    stable = False
+
+    def __init__(self, stable=False):
+        # With stable=True ties are decorated with their position, so the result is stable
+        self.require_stable = stable
+
+    def sort_list(self, items):
+        # Iterative introsort: quick sort with the median of three random items as pivot and a
+        # three-way partition, so duplicates don't degrade it. Ranges partitioned more than
+        # 2 * log2(n) times are finished with heap sort, so the worst case is O(n log n). Small
+        # ranges are finished with insertion sort.
+        items = list(items)
+        depth_limit = 2 * max(len(items), 1).bit_length()
+        stack = [(0, len(items) - 1, 0)]
+        while stack:
+            low, high, depth = stack.pop()
+            if high - low < 16:
+                self._insertion_sort(items, low, high)
+                continue
+            if depth > depth_limit:
+                self._heap_sort(items, low, high)
+                continue
+
+            samples = [items[random.randint(low, high)] for _ in range(3)]
+            pivot = sorted(samples)[1]
+            less, index, greater = low, low, high
+            while index <= greater:
+                if items[index] < pivot:
+                    items[less], items[index] = items[index], items[less]
+                    less += 1
+                    index += 1
+                elif pivot < items[index]:
+                    items[index], items[greater] = items[greater], items[index]
+                    greater -= 1
+                else:
+                    index += 1
+            # The smaller range is pushed last and sorted first, so the stack stays O(log n)
+            ranges = sorted(((low, less - 1), (greater + 1, high)), key=lambda r: r[0] - r[1])
+            for range_low, range_high in ranges:
+                stack.append((range_low, range_high, depth + 1))
+        return items
+
+    @staticmethod
+    def _heap_sort(items, low, high):
+        heap = items[low:high + 1]
+        heapq.heapify(heap)
+        items[low:high + 1] = [heapq.heappop(heap) for _ in range(len(heap))]
+
+    @staticmethod
+    def _insertion_sort(items, low, high):
+        for index in range(low + 1, high + 1):
+            item = items[index]
+            position = index - 1
+            while position >= low and item < items[position]:
+                items[position + 1] = items[position]
+                position -= 1
+            items[position + 1] = item
 
 
 class TimSort(SortStrategy):
 
-    def sort(self, items):
-        print('Sorting items using tim sort')
+    def sort_list(self, items):
+        # Python's built-in sort is TimSort
+        return sorted(items)
 
 
 class Sort:
@@ -61,22 +180,259 @@ class Sort:
     def set_sort_strategy(self, strategy):
         self.strategy = strategy
 
-    def sort(self, items):
-        self.strategy.sort(items)
+    def sort(self, items, key=None, reverse=False):
+        return self.strategy.sort(items, key=key, reverse=reverse)
+
+
+# Example 2
+# Below example sorts big numeric arrays on several cores. The array is copied once into shared
+# memory, so worker processes read and write it without pickling the data. Workers first sort one
+# chunk each in place. The sorted chunks are then cut at common splitter values, and each worker
+# merges the pieces of every chunk that fall in its value range straight into its slice of the
+# output. Small inputs, keys and non-numeric data use the single-core MergeSort path.
+
+
+def _attach(name, shape, dtype):
+    memory = shared_memory.SharedMemory(name=name)
+    return memory, numpy.ndarray(shape, dtype=dtype, buffer=memory.buf)
+
+
+def _sort_chunk(task):
+    name, shape, dtype, start, stop = task
+    memory, array = _attach(name, shape, dtype)
+    # Equal numbers can't be told apart, so the faster unstable sort is fine here
+    array[start:stop].sort()
+    del array
+    memory.close()
+
+
+def _merge_partition(task):
+    # Sorted pieces are concatenated and sorted with a stable sort, which is TimSort for most
+    # dtypes and only merges the already sorted runs
+    source_name, target_name, shape, dtype, pieces, offset = task
+    source_memory, source = _attach(source_name, shape, dtype)
+    target_memory, target = _attach(target_name, shape, dtype)
+    merged = numpy.concatenate([source[start:stop] for start, stop in pieces])
+    merged.sort(kind='stable')
+    target[offset:offset + len(merged)] = merged
+    del source, target
+    source_memory.close()
+    target_memory.close()
+
+
+class ParallelMergeSort(MergeSort):
+
+    def __init__(self, workers=None, threshold=1000000):
+        # os.cpu_count() returns None when the count cannot be determined
+        self.workers = workers or os.cpu_count() or 1
+        self.threshold = threshold
+
+    def sort(self, items, key=None, reverse=False):
+        if (
+            numpy is None
+            or not isinstance(items, numpy.ndarray)
+            or key is not None
+            or items.ndim != 1
+            or items.dtype.kind not in 'biuf'
+            or len(items) < self.threshold
+            or self.workers < 2
+            # Every chunk must be able to give one sample per worker
+            or len(items) < self.workers ** 2
+        ):
+            return super().sort(items, key=key, reverse=reverse)
+
+        source_memory = shared_memory.SharedMemory(create=True, size=items.nbytes)
+        target_memory = shared_memory.SharedMemory(create=True, size=items.nbytes)
+        try:
+            source = numpy.ndarray(items.shape, dtype=items.dtype, buffer=source_memory.buf)
+            target = numpy.ndarray(items.shape, dtype=items.dtype, buffer=target_memory.buf)
+            source[:] = items
+            self._sort_shared(source, source_memory.name, target_memory.name)
+            result = target.copy()
+            del source, target
+        finally:
+            source_memory.close()
+            source_memory.unlink()
+            target_memory.close()
+            target_memory.unlink()
+        return result[::-1] if reverse else result
+
+    def _sort_shared(self, source, source_name, target_name):
+        shape, dtype = source.shape, source.dtype.str
+        bounds = numpy.linspace(0, len(source), self.workers + 1).astype(numpy.int64)
+        chunks = list(zip(bounds[:-1], bounds[1:]))
+
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            list(executor.map(_sort_chunk, [
+                (source_name, shape, dtype, start, stop) for start, stop in chunks
+            ]))
+
+            # Pick splitters from a regular sample of every sorted chunk
+            samples = numpy.sort(numpy.concatenate([
+                source[start:stop][numpy.linspace(0, stop - start - 1, self.workers).astype(int)]
+                for start, stop in chunks
+            ]))
+            splitters = samples[self.workers::self.workers][:self.workers - 1]
+            cuts = [
+                numpy.r_[
+                    start,
+                    start + numpy.searchsorted(source[start:stop], splitters, side='right'),
+                    stop,
+                ]
+                for start, stop in chunks
+            ]
+
+            tasks = []
+            offset = 0
+            for partition in range(self.workers):
+                pieces = [(cut[partition], cut[partition + 1]) for cut in cuts]
+                tasks.append((source_name, target_name, shape, dtype, pieces, offset))
+                offset += sum(stop - start for start, stop in pieces)
+            list(executor.map(_merge_partition, tasks))
+
+
+# Example 3
+# Below example picks the strategy for the caller. Small inputs go straight to TimSort. Larger ones
+# are profiled (size, type, how sorted they already are, how many duplicates they have) and the
+# profile is mapped to a coarse signature. The first time a signature is seen, every registered
+# strategy is timed on a slice of the input and the timings are cached. Later inputs with the same
+# signature use the cached fastest strategy. Real sorts are timed too, and if they keep missing the
+# prediction the signature is calibrated again.
+
+
+DataProfile = namedtuple('DataProfile', ['size', 'kind', 'inversions', 'runs', 'duplicates'])
+
+
+def profile_data(items, key=None, sample_size=1000):
+    size = len(items)
+    sample = items[::max(size // sample_size, 1)][:sample_size]
+    if numpy is not None and isinstance(items, numpy.ndarray):
+        kind = 'numpy-{}'.format(items.dtype.kind)
+        sample = sample.tolist()
+    else:
+        kind = type(sample[0]).__name__ if size else 'empty'
+    if key:
+        sample = [key(item) for item in sample]
+
+    # Share of sampled pairs out of order: 0 when sorted, about 0.5 when random, 1 when reversed
+    inversions = 0.0
+    # Ascending runs in the sample, as the share of neighbours that start a new run. Low for data
+    # made of a few sorted runs even when the runs are out of order.
+    runs = 0.0
+    if len(sample) > 1:
+        pairs = [sorted(random.sample(range(len(sample)), 2)) for _ in range(len(sample))]
+        inversions = sum(sample[j] < sample[i] for i, j in pairs) / len(pairs)
+        runs = sum(right < left for left, right in zip(sample, sample[1:])) / (len(sample) - 1)
+
+    try:
+        duplicates = 1 - len(set(sample)) / len(sample) if sample else 0.0
+    except TypeError:
+        duplicates = 0.0  # unhashable items
+    return DataProfile(size, kind, inversions, runs, duplicates)
+
+
+class AutoSort(SortStrategy):
+
+    def __init__(
+        self, strategies=None, calibration_size=10000, tolerance=2.0, drift_limit=3, min_size=1000,
+    ):
+        self.strategies = list(strategies) if strategies else [TimSort(), MergeSort(), QuickSort()]
+        # Below min_size items profiling would cost more than any strategy could save
+        self.min_size = min_size
+        self.calibration_size = calibration_size
+        self.tolerance = tolerance
+        self.drift_limit = drift_limit
+        self.timings = {}  # signature -> {strategy: seconds per n log n}
+        self._drift = {}  # signature -> consecutive missed predictions
+
+    def register(self, strategy):
+        self.strategies.append(strategy)
+        self.timings.clear()
+
+    def sort(self, items, key=None, reverse=False):
+        if not isinstance(items, (list, tuple)) and not (
+            numpy is not None and isinstance(items, numpy.ndarray)
+        ):
+            items = list(items)
+        if len(items) < self.min_size:
+            return TimSort().sort(items, key=key, reverse=reverse)
+
+        signature = self.signature(profile_data(items, key))
+        if signature not in self.timings:
+            self.timings[signature] = self._calibrate(items, key, reverse)
+        costs = self.timings[signature]
+        strategy = min(costs, key=costs.get)
+
+        start = time.perf_counter()
+        result = strategy.sort(items, key=key, reverse=reverse)
+        cost = (time.perf_counter() - start) / self._work(len(items))
+        self._check_drift(signature, strategy, cost)
+        return result
+
+    def sort_list(self, items):
+        return self.sort(items)
+
+    @staticmethod
+    def signature(profile):
+        # Coarse buckets, so similar inputs share a calibration
+        return (
+            profile.size.bit_length(),
+            profile.kind,
+            round(profile.inversions * 4),
+            round(profile.runs * 4),
+            round(profile.duplicates * 4),
+        )
+
+    def _calibrate(self, items, key, reverse):
+        start = max((len(items) - self.calibration_size) // 2, 0)
+        sample = items[start:start + self.calibration_size]
+        costs = {}
+        for strategy in self.strategies:
+            began = time.perf_counter()
+            strategy.sort(sample, key=key, reverse=reverse)
+            costs[strategy] = (time.perf_counter() - began) / self._work(len(sample))
+        return costs
+
+    def _check_drift(self, signature, strategy, cost):
+        predicted = self.timings[signature][strategy]
+        if predicted / self.tolerance <= cost <= predicted * self.tolerance:
+            self._drift[signature] = 0
+            return
+        self._drift[signature] = self._drift.get(signature, 0) + 1
+        if self._drift[signature] >= self.drift_limit:
+            del self.timings[signature]
+            self._drift[signature] = 0
+
+    @staticmethod
+    def _work(size):
+        return max(size * math.log2(max(size, 2)), 1)
 
 
 if __name__ == '__main__':
     items = [1, 2, 4, 5]
 
     sort_cls = Sort()
-    sort_cls.sort(items)
+    print(sort_cls.sort(items))
+
+    sort_cls.set_sort_strategy(QuickSort())
+    print(sort_cls.sort(items, reverse=True))
 
     sort_cls.set_sort_strategy(TimSort())
-    sort_cls.sort(items)
+    print(sort_cls.sort(['pear', 'fig', 'apple'], key=len))
+
+    if numpy is not None:
+        sort_cls.set_sort_strategy(ParallelMergeSort(workers=2, threshold=4))
+        print(sort_cls.sort(numpy.array([5, 3, 9, 1, 7, 2])).tolist())
+
+    sort_cls.set_sort_strategy(AutoSort())
+    print(sort_cls.sort([3, 1, 2] * 1000)[::1000])
 
 
 """
 Output
-Sorting items using merge sort
-Sorting items using tim sort
+[1, 2, 4, 5]
+[5, 4, 2, 1]
+['fig', 'pear', 'apple']
+[1, 2, 3, 5, 7, 9]
+[1, 2, 3]
 """
\ No newline at end of file
@@ -1,5 +1,13 @@
+import keyword
+import os
+import weakref
 from abc import ABC, abstractmethod
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 """
 Visitor Pattern
 
@@ -42,37 +50,103 @@ the algorithm.
 # and call the appropriate method.
 
 
+def visits(*node_classes):
+    # Registers the decorated visitor method as the handler of node_classes, instead of relying on
+    # the pretty_print_<class name> naming convention
+    def decorator(method):
+        method.visits = node_classes
+        return method
+    return decorator
+
+
 class ExpressionVisitor:
 
+    # Handlers are looked up once per concrete node class and cached per visitor class
+    _handlers = {}
+    _emitters = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._handlers = {}
+        cls._emitters = {}
+
     def __init__(self):
         self.result = ""
 
     def visit(self, expression, *args, **kwargs):
-        method = None
-        for cls in expression.__class__.__mro__:
-            method_name = 'pretty_print_{}'.format(cls.__name__.lower())
-            method = getattr(self, method_name, None)
+        handler = self._handlers.get(expression.__class__)
+        if handler is None:
+            handler = self._handlers[expression.__class__] = self._resolve(expression.__class__)
+        return handler(self, expression, *args, **kwargs)
+
+    def visit_iteratively(self, expression):
+        # Same output as visit, but walks the tree with an explicit stack so depth is not limited
+        # by the recursion limit, and joins the output fragments once at the end. Uses the
+        # emit_<class name> methods, which return the fragments and child nodes of a node in order.
+        fragments = []
+        stack = [expression]
+        while stack:
+            item = stack.pop()
+            if isinstance(item, str):
+                fragments.append(item)
+                continue
+            emitter = self._emitters.get(item.__class__)
+            if emitter is None:
+                emitter = self._emitters[item.__class__] = self._resolve(item.__class__, 'emit')
+            stack.extend(reversed(emitter(self, item)))
+        self.result += ''.join(fragments)
+
+    @classmethod
+    def _resolve(cls, node_class, prefix='pretty_print'):
+        registered = {}
+        if prefix == 'pretty_print':
+            for visitor_class in reversed(cls.__mro__):
+                for attribute in vars(visitor_class).values():
+                    for registered_class in getattr(attribute, 'visits', ()):
+                        registered[registered_class] = attribute
+
+        for node_base in node_class.__mro__:
+            if node_base in registered:
+                return registered[node_base]
+            method_name = '{}_{}'.format(prefix, node_base.__name__.lower())
+            method = getattr(cls, method_name, None)
             if method:
-                break
+                return method
 
-        if not method:
-            raise NotImplementedError(
-                'Please implement pretty print implementation for class {}'.format(
-                    expression.__class__.__name__,
-                )
+        raise NotImplementedError(
+            'Please implement pretty print implementation for class {}'.format(
+                node_class.__name__,
             )
+        )
+
+    # The pretty_print_<class name> methods print what the emit_<class name> methods return, so
+    # overriding an emit method changes the output of both visit and visit_iteratively. Overriding a
+    # pretty_print method or registering a handler with visits only changes visit.
 
-        return method(expression, *args, **kwargs)
+    def _print_fragments(self, fragments):
+        for fragment in fragments:
+            if isinstance(fragment, str):
+                self.result += fragment
+            else:
+                self.visit(fragment)
 
     def pretty_print_addition(self, addition, *args, **kwargs):
-        self.result += "("
-        self.visit(addition.left)
-        self.result += "+"
-        self.visit(addition.right)
-        self.result += ")"
+        self._print_fragments(self.emit_addition(addition))
 
     def pretty_print_literal(self, literal, *args, **kwargs):
-        self.result += str(literal.value)
+        self._print_fragments(self.emit_literal(literal))
+
+    def pretty_print_variable(self, variable, *args, **kwargs):
+        self._print_fragments(self.emit_variable(variable))
+
+    def emit_addition(self, addition):
+        return "(", addition.left, "+", addition.right, ")"
+
+    def emit_literal(self, literal):
+        return str(literal.value),
+
+    def emit_variable(self, variable):
+        return variable.name,
 
 
 class Literal:
@@ -90,14 +164,349 @@ class Addition:
         self.right = right
 
 
+# Example 2
+# Below example registers handlers with the visits decorator instead of naming them after the
+# node class.
+
+
+class EvaluationVisitor(ExpressionVisitor):
+
+    @visits(Literal)
+    def evaluate_literal(self, literal):
+        return literal.value
+
+    @visits(Addition)
+    def evaluate_addition(self, addition):
+        return self.visit(addition.left) + self.visit(addition.right)
+
+
+# Example 3
+# Below example compiles an expression once so it can be evaluated many times without walking the
+# object graph. Identical subtrees are hash-consed into one shared node, so the expression becomes
+# a DAG. Additions of two literals are folded into a literal. The DAG is then turned into straight
+# line Python code with one local per shared node, and compiled into a function that takes the
+# variables as arguments.
+
+
+def _check_variable_name(name):
+    # Names are pasted into generated source, so anything but a plain identifier is refused. Names
+    # starting with _ are reserved for the locals of compiled expressions.
+    if (
+        not isinstance(name, str)
+        or not name.isidentifier()
+        or keyword.iskeyword(name)
+        or name.startswith('_')
+    ):
+        raise ValueError('Invalid variable name {!r}'.format(name))
+
+
+class Variable:
+
+    def __init__(self, name):
+        _check_variable_name(name)
+        self.name = name
+
+
+class ExpressionCompiler:
+
+    def __init__(self, max_nodes=10000):
+        # Both caches are dropped once more than max_nodes canonical nodes are interned
+        self.max_nodes = max_nodes
+        self._nodes = {}  # structural key -> canonical node
+        self._compiled = {}  # canonical root -> compiled function
+        self._evaluators = weakref.WeakKeyDictionary()  # expression -> compiled function
+
+    def intern(self, expression):
+        # Returns the canonical, constant folded node for expression. Iterative, so deep trees are
+        # fine.
+        if len(self._nodes) > self.max_nodes:
+            self._nodes.clear()
+            self._compiled.clear()
+        canonical = {}  # id(node) -> canonical node
+        stack = [(expression, False)]
+        while stack:
+            node, children_done = stack.pop()
+            if id(node) in canonical:
+                continue
+            if isinstance(node, Addition) and not children_done:
+                stack.append((node, True))
+                stack.append((node.right, False))
+                stack.append((node.left, False))
+                continue
+            canonical[id(node)] = self._canonical(node, canonical)
+        return canonical[id(expression)]
+
+    def compile(self, expression):
+        root = self.intern(expression)
+        function = self._compiled.get(root)
+        if function is None:
+            function = self._compiled[root] = self._generate(root)
+        return function
+
+    def evaluate(self, expression, **bindings):
+        # Compiles expression on its first evaluation only, so it must not be changed afterwards
+        function = self._evaluators.get(expression)
+        if function is None:
+            function = self._evaluators[expression] = self.compile(expression)
+        return function(**bindings)
+
+    def _canonical(self, node, canonical):
+        if isinstance(node, Literal):
+            # Floats are keyed by their exact bits, since 0.0 == -0.0 and nan != nan
+            value = node.value.hex() if isinstance(node.value, float) else node.value
+            key = (Literal, value, type(node.value))
+        elif isinstance(node, Variable):
+            key = (Variable, node.name)
+        elif isinstance(node, Addition):
+            left = canonical[id(node.left)]
+            right = canonical[id(node.right)]
+            if isinstance(left, Literal) and isinstance(right, Literal):
+                return self._canonical(Literal(left.value + right.value), canonical)
+            key = (Addition, id(left), id(right))
+            node = Addition(left, right)
+        else:
+            raise NotImplementedError(
+                'Cannot compile expression of class {}'.format(node.__class__.__name__)
+            )
+        return self._nodes.setdefault(key, node)
+
+    @staticmethod
+    def _generate(root):
+        # Post order over the DAG, each shared node computed once
+        names = {}
+        constants = {}
+        variables = set()
+        lines = []
+        stack = [(root, False)]
+        while stack:
+            node, children_done = stack.pop()
+            if id(node) in names:
+                continue
+            if isinstance(node, Literal):
+                names[id(node)] = '_c{}'.format(len(constants))
+                constants[names[id(node)]] = node.value
+            elif isinstance(node, Variable):
+                # Checked again since the name may have been changed after the node was created
+                _check_variable_name(node.name)
+                names[id(node)] = node.name
+                variables.add(node.name)
+            elif not children_done:
+                stack.append((node, True))
+                stack.append((node.right, False))
+                stack.append((node.left, False))
+            else:
+                names[id(node)] = '_t{}'.format(len(lines))
+                lines.append('    {} = {} + {}'.format(
+                    names[id(node)],
+                    names[id(node.left)],
+                    names[id(node.right)],
+                ))
+
+        source = 'def evaluate({}):\n{}\n    return {}\n'.format(
+            ', '.join(sorted(variables)),
+            '\n'.join(lines),
+            names[id(root)],
+        )
+        namespace = dict(constants)
+        exec(compile(source, '<expression>', 'exec'), namespace)
+        return namespace['evaluate']
+
+
+# Example 4
+# Below example stores many expressions as flat arrays (struct of arrays) instead of objects: node
+# kind, left and right child index and a value per node, about 21 bytes per node. Nodes are stored
+# children first, and every node also records its height, so all nodes of the same height can be
+# evaluated together with one NumPy operation. Evaluation is vectorized over all expressions and
+# over a batch of variable bindings at once. Float literals are stored as float64 and int literals
+# as int64 bits in the same array, so both round trip exactly.
+
+
+class ExpressionArray:
+
+    LITERAL = 0
+    VARIABLE = 1
+    ADDITION = 2
+    INT_LITERAL = 3
+
+    def __init__(self, kind, left, right, value, height, roots, variables):
+        if numpy is None:
+            raise ImportError('numpy is required for ExpressionArray')
+        self.kind = kind  # int8
+        self.left = left  # int32, -1 for leaves
+        self.right = right  # int32, -1 for leaves
+        # float64 literal value, int64 bits of an int literal, or index into variables
+        self.value = value
+        self.height = height  # int32, 0 for leaves
+        self.roots = roots  # int32 index of every expression root
+        self.variables = variables  # list of variable names
+
+    @classmethod
+    def from_expressions(cls, expressions):
+        kind, left, right, value, height = [], [], [], [], []
+        variables = {}
+        int_literals = {}  # position -> value of int literals
+        index = {}  # id(node) -> position, shared nodes are stored once
+        roots = []
+        for expression in expressions:
+            stack = [(expression, False)]
+            while stack:
+                node, children_done = stack.pop()
+                if id(node) in index:
+                    continue
+                if isinstance(node, Addition) and not children_done:
+                    stack.append((node, True))
+                    stack.append((node.right, False))
+                    stack.append((node.left, False))
+                    continue
+
+                if isinstance(node, Addition):
+                    left_index, right_index = index[id(node.left)], index[id(node.right)]
+                    kind.append(cls.ADDITION)
+                    left.append(left_index)
+                    right.append(right_index)
+                    value.append(0.0)
+                    height.append(max(height[left_index], height[right_index]) + 1)
+                else:
+                    if isinstance(node, Literal) and type(node.value) is float:
+                        kind.append(cls.LITERAL)
+                        value.append(node.value)
+                    elif isinstance(node, Literal) and type(node.value) is int:
+                        if not -2 ** 63 <= node.value < 2 ** 63:
+                            raise ValueError('Literal {} does not fit in int64'.format(node.value))
+                        int_literals[len(kind)] = node.value
+                        kind.append(cls.INT_LITERAL)
+                        value.append(0.0)
+                    elif isinstance(node, Variable):
+                        kind.append(cls.VARIABLE)
+                        value.append(variables.setdefault(node.name, len(variables)))
+                    elif isinstance(node, Literal):
+                        raise ValueError('Cannot encode literal {!r}'.format(node.value))
+                    else:
+                        raise NotImplementedError(
+                            'Cannot encode expression of class {}'.format(node.__class__.__name__)
+                        )
+                    left.append(-1)
+                    right.append(-1)
+                    height.append(0)
+                index[id(node)] = len(kind) - 1
+            roots.append(index[id(expression)])
+
+        value = numpy.array(value, dtype=numpy.float64)
+        value.view(numpy.int64)[list(int_literals)] = list(int_literals.values())
+        return cls(
+            numpy.array(kind, dtype=numpy.int8),
+            numpy.array(left, dtype=numpy.int32),
+            numpy.array(right, dtype=numpy.int32),
+            value,
+            numpy.array(height, dtype=numpy.int32),
+            numpy.array(roots, dtype=numpy.int32),
+            list(variables),
+        )
+
+    def to_expressions(self):
+        nodes = []
+        for position, node_kind in enumerate(self.kind.tolist()):
+            if node_kind == self.ADDITION:
+                nodes.append(Addition(nodes[self.left[position]], nodes[self.right[position]]))
+            elif node_kind == self.VARIABLE:
+                nodes.append(Variable(self.variables[int(self.value[position])]))
+            elif node_kind == self.INT_LITERAL:
+                nodes.append(Literal(self.value.view(numpy.int64)[position].item()))
+            else:
+                nodes.append(Literal(self.value[position].item()))
+        return [nodes[root] for root in self.roots]
+
+    def evaluate(self, **bindings):
+        # bindings map variable names to scalars or 1-D arrays of the same length. Returns an
+        # array of shape (expressions, bindings).
+        batch = max([numpy.size(values) for values in bindings.values()] or [1])
+        results = numpy.empty((len(self.kind), batch), dtype=numpy.float64)
+
+        leaves = self.kind == self.LITERAL
+        results[leaves] = self.value[leaves, None]
+        int_leaves = self.kind == self.INT_LITERAL
+        results[int_leaves] = self.value.view(numpy.int64)[int_leaves, None]
+        for variable_index, name in enumerate(self.variables):
+            if name not in bindings:
+                raise ValueError('No value given for variable {}'.format(name))
+            rows = (self.kind == self.VARIABLE) & (self.value == variable_index)
+            results[rows] = numpy.asarray(bindings[name], dtype=numpy.float64)
+
+        additions = numpy.flatnonzero(self.kind == self.ADDITION)
+        levels = self.height[additions]
+        order = numpy.argsort(levels, kind='stable')
+        additions, levels = additions[order], levels[order]
+        for level in numpy.split(additions, numpy.flatnonzero(numpy.diff(levels)) + 1):
+            results[level] = results[self.left[level]] + results[self.right[level]]
+        return results[self.roots]
+
+    @staticmethod
+    def _npz_path(path):
+        # numpy.savez adds the .npz suffix when it is missing but numpy.load does not
+        path = os.fspath(path)
+        return path if path.endswith('.npz') else path + '.npz'
+
+    def save(self, path):
+        numpy.savez(
+            self._npz_path(path),
+            kind=self.kind,
+            left=self.left,
+            right=self.right,
+            value=self.value,
+            height=self.height,
+            roots=self.roots,
+            variables=numpy.array(self.variables, dtype=str),
+        )
+
+    @classmethod
+    def load(cls, path):
+        with numpy.load(cls._npz_path(path), allow_pickle=False) as data:
+            return cls(
+                data['kind'],
+                data['left'],
+                data['right'],
+                data['value'],
+                data['height'],
+                data['roots'],
+                data['variables'].tolist(),
+            )
+
+
 if __name__ == '__main__':
     expression = Addition(Literal(1), Addition(Literal(2), Literal(6)))
     visitor = ExpressionVisitor()
     visitor.visit(expression)
     print(visitor.result)
+    print(EvaluationVisitor().visit(expression))
+
+    iterative_visitor = ExpressionVisitor()
+    iterative_visitor.visit_iteratively(expression)
+    print(iterative_visitor.result)
+
+    compiler = ExpressionCompiler()
+    evaluate = compiler.compile(Addition(
+        Addition(Variable('x'), Addition(Literal(2), Literal(6))),
+        Addition(Variable('x'), Addition(Literal(2), Literal(6))),
+    ))
+    print([evaluate(x=x) for x in range(3)])
+
+    if numpy is not None:
+        expressions = ExpressionArray.from_expressions([
+            expression,
+            Addition(Variable('x'), Literal(10)),
+        ])
+        print(expressions.evaluate(x=numpy.arange(3)).tolist())
+        printer = ExpressionVisitor()
+        printer.visit(expressions.to_expressions()[1])
+        print(printer.result)
 
 
 """
 Output
 (1+(2+6))
+9
+(1+(2+6))
+[16, 18, 20]
+[[9.0, 9.0, 9.0], [10.0, 11.0, 12.0]]
+(x+10)
 """
\ No newline at end of file